@@ -20,6 +20,7 @@
 
 import sys
 import random
+import numpy
 from mathutils import Vector, Matrix
 
 sys.path.append('.')
@@ -148,6 +149,51 @@ def rotate_obj_gradient(obj, normal, gradient):
     # Re-adjust the scale
     obj.scale = Vector((1, 1, 1))
 
+# Builds the orthonormal frames used by rotate_obj_gradient for many glyphs
+# at once. Falls back to the world x (or y) axis where the gradient is
+# zero or parallel to the normal.
+# :normals: (N x 3 array)
+# :gradients: (N x 3 array)
+# Returns an N x 3 x 3 array whose columns are the local x, y, z axes
+def gradient_frames(normals, gradients, eps=1e-6):
+    z = numpy.asarray(normals, dtype=float).reshape(-1, 3)
+    z = z / numpy.maximum(numpy.linalg.norm(z, axis=1), eps)[:, None]
+    g = numpy.array(gradients, dtype=float).reshape(-1, 3)
+    y = numpy.cross(g, z)
+    y_len = numpy.linalg.norm(y, axis=1)
+    degenerate = y_len <= eps * numpy.maximum(numpy.linalg.norm(g, axis=1), 1)
+    if degenerate.any():
+        fallback = numpy.zeros((degenerate.sum(), 3))
+        use_y = numpy.abs(z[degenerate, 0]) > 0.9
+        fallback[~use_y, 0] = 1
+        fallback[use_y, 1] = 1
+        y[degenerate] = numpy.cross(fallback, z[degenerate])
+        y_len[degenerate] = numpy.linalg.norm(y[degenerate], axis=1)
+    y /= y_len[:, None]
+    x = numpy.cross(y, z)
+    return numpy.stack((x, y, z), axis=2)
+
+# Vectorized equivalent of rotate_obj_gradient followed by per-object
+# scaling and a push along the normal
+# :locations: (N x 3 array)
+# :normals: (N x 3 array)
+# :gradients: (N x 3 array)
+# :scales: (N x 3 array) scale along the local x, y, z axes
+# :offsets: (N array) distance to move each glyph along its normal
+# Returns an N x 4 x 4 array of world matrices
+def glyph_transforms(locations, normals, gradients, scales, offsets=None):
+    frames = gradient_frames(normals, gradients)
+    n = len(frames)
+    matrices = numpy.zeros((n, 4, 4))
+    matrices[:, :3, :3] = frames * \
+            numpy.asarray(scales, dtype=float).reshape(-1, 1, 3)
+    matrices[:, :3, 3] = numpy.asarray(locations, dtype=float).reshape(-1, 3)
+    if offsets is not None:
+        matrices[:, :3, 3] += frames[:, :, 2] * \
+                numpy.asarray(offsets, dtype=float)[:, None]
+    matrices[:, 3, 3] = 1
+    return matrices
+
 def nearest_vertex(vertices, coord):
     min_index = 0
     min_dist = (vertices[0].co - coord).length
@@ -225,3 +271,72 @@ def gradient_at_vertex_2(edges, vertices, vert_index):
 
     return ((downhill_sum/len(neighbor_indices)) + \
             gradient_at_vertex(edges, vertices, vert_index))/2
+
+# Vectorized gradient_at_vertex_2 for every vertex at once, from one pass
+# over the edges instead of an edge scan per neighbour
+# :vertices: (bpy_prop_collection MeshVertices)
+# :edges: (bpy_prop_collection MeshEdges)
+# Returns a V x 3 array
+def vertex_gradients(vertices, edges):
+    nv, ne = len(vertices), len(edges)
+    co = numpy.empty(nv * 3)
+    vertices.foreach_get('co', co)
+    co = co.reshape(-1, 3)
+    normals = numpy.empty(nv * 3)
+    vertices.foreach_get('normal', normals)
+    normals = normals.reshape(-1, 3)
+    pairs = numpy.empty(ne * 2, dtype=numpy.int64)
+    edges.foreach_get('vertices', pairs)
+    pairs = pairs.reshape(-1, 2)
+
+    # Directed edges, grouped by their first vertex
+    src = numpy.concatenate((pairs[:, 0], pairs[:, 1]))
+    dst = numpy.concatenate((pairs[:, 1], pairs[:, 0]))
+    order = numpy.argsort(src, kind='mergesort')
+    src, dst = src[order], dst[order]
+    degree = numpy.bincount(src, minlength=nv)
+    starts = numpy.concatenate(([0], numpy.cumsum(degree)[:-1]))
+    safe_degree = numpy.maximum(degree, 1)[:, None]
+
+    # gradient_at_vertex: neighbour directions weighted by the normalized
+    # change in normal
+    offsets = co[dst] - co[src]
+    lengths = numpy.linalg.norm(offsets, axis=1)
+    directions = offsets / numpy.maximum(lengths, 1e-12)[:, None]
+    dots = 1 - (normals[src] * normals[dst]).sum(axis=1)
+    high = numpy.full(nv, -numpy.inf)
+    numpy.maximum.at(high, src, dots)
+    low = numpy.full(nv, numpy.inf)
+    numpy.minimum.at(low, src, dots)
+    denom = (high - low)[src]
+    flat = numpy.abs(denom) <= 0.000001
+    weights = numpy.where(flat, 1, (dots - low[src]) /
+            numpy.where(flat, 1, denom))
+    ring1 = numpy.zeros((nv, 3))
+    numpy.add.at(ring1, src, weights[:, None] * directions)
+    ring1 /= safe_degree
+
+    # First ring, weighted by distance from the furthest neighbour
+    max_dist = numpy.zeros(nv)
+    numpy.maximum.at(max_dist, src, lengths)
+    downhill = numpy.zeros((nv, 3))
+    numpy.add.at(downhill, src,
+            (max_dist[src] - lengths)[:, None] * ring1[dst])
+
+    # Second ring: every path v -> n -> m, with distances measured from v
+    counts = degree[dst]
+    path_edge = numpy.repeat(numpy.arange(len(src)), counts)
+    first = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    step = numpy.arange(len(path_edge)) - numpy.repeat(first, counts)
+    m = dst[numpy.repeat(starts[dst], counts) + step]
+    v = src[path_edge]
+    dist2 = numpy.linalg.norm(co[m] - co[v], axis=1)
+    max_dist2 = numpy.zeros(len(src))
+    numpy.maximum.at(max_dist2, path_edge, dist2)
+    sub = numpy.zeros((len(src), 3))
+    numpy.add.at(sub, path_edge,
+            (max_dist2[path_edge] - dist2)[:, None] * ring1[m])
+    sub /= numpy.maximum(counts, 1)[:, None]
+    numpy.add.at(downhill, src, sub)
+
+    return (downhill / safe_degree + ring1) / 2
@@ -0,0 +1,156 @@
+#  Copyright 2018 Bridger Herman
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Oriented box collision for glyph packing. Boxes are stored in a spatial
+# hash keyed by their bounding spheres (broad phase); candidates that pass
+# the sphere test go through a separating axis test, vectorized over all
+# candidates at once (narrow phase).
+
+import itertools
+
+import numpy
+
+EPSILON = 1e-9
+
+# Separating axis test between one box and many
+# :center: (3 array) :axes: (3 x 3 array, columns are the box axes)
+# :extents: (3 array) half extents along the axes
+# :centers:, :axes_b:, :extents_b: the same for K boxes, stacked
+# Returns a K array, True where the boxes overlap
+def obb_overlaps(center, axes, extents, centers, axes_b, extents_b):
+    a = numpy.asarray(extents, dtype=float)
+    b = numpy.asarray(extents_b, dtype=float)
+    # Rotation of each B into A's frame, and B's center in A's frame
+    r = numpy.einsum('ji,kjl->kil', axes, axes_b)
+    t = numpy.einsum('ji,kj->ki', axes, numpy.asarray(centers) - center)
+    abs_r = numpy.abs(r) + EPSILON
+
+    separated = numpy.zeros(len(b), dtype=bool)
+    # A's face axes
+    for i in range(3):
+        rb = (b * abs_r[:, i, :]).sum(axis=1)
+        separated |= numpy.abs(t[:, i]) > a[i] + rb
+    # B's face axes
+    for j in range(3):
+        ra = (a[None, :] * abs_r[:, :, j]).sum(axis=1)
+        separated |= numpy.abs((t * r[:, :, j]).sum(axis=1)) > ra + b[:, j]
+    # Edge-edge cross products
+    for i, j in itertools.product(range(3), repeat=2):
+        i1, i2 = (i + 1) % 3, (i + 2) % 3
+        j1, j2 = (j + 1) % 3, (j + 2) % 3
+        ra = a[i1] * abs_r[:, i2, j] + a[i2] * abs_r[:, i1, j]
+        rb = b[:, j1] * abs_r[:, i, j2] + b[:, j2] * abs_r[:, i, j1]
+        dist = numpy.abs(t[:, i2] * r[:, i1, j] - t[:, i1] * r[:, i2, j])
+        separated |= dist > ra + rb
+    return ~separated
+
+class BoxIndex:
+    '''Set of oriented boxes supporting overlap queries
+
+    :cell_size: (float) spatial hash cell size; about the diameter of a
+    typical box works well
+    '''
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.count = 0
+        self.removed = 0
+        self.centers = numpy.zeros((16, 3))
+        self.axes = numpy.zeros((16, 3, 3))
+        self.extents = numpy.zeros((16, 3))
+        self.radii = numpy.zeros(16)
+
+    def __len__(self):
+        return self.count - self.removed
+
+    def _cells(self, center, radius):
+        lo = numpy.floor((center - radius) / self.cell_size).astype(int)
+        hi = numpy.floor((center + radius) / self.cell_size).astype(int)
+        return itertools.product(*[range(l, h + 1) for l, h in zip(lo, hi)])
+
+    def _grow(self):
+        size = 2 * len(self.radii)
+        for name in ('centers', 'axes', 'extents', 'radii'):
+            old = getattr(self, name)
+            new = numpy.zeros((size,) + old.shape[1:])
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def insert(self, center, axes, extents):
+        '''Add a box and return its id'''
+        if self.count == len(self.radii):
+            self._grow()
+        i = self.count
+        self.centers[i] = center
+        self.axes[i] = axes
+        self.extents[i] = extents
+        self.radii[i] = numpy.linalg.norm(extents)
+        for cell in self._cells(self.centers[i], self.radii[i]):
+            self.cells.setdefault(cell, []).append(i)
+        self.count += 1
+        return i
+
+    def remove(self, i):
+        '''Drop a box from future queries; ids of other boxes are unchanged'''
+        for cell in self._cells(self.centers[i], self.radii[i]):
+            ids = self.cells.get(cell)
+            if ids != None and i in ids:
+                ids.remove(i)
+        self.removed += 1
+
+    def candidates(self, center, radius):
+        '''Ids of boxes whose bounding spheres touch the given sphere'''
+        center = numpy.asarray(center, dtype=float)
+        ids = set()
+        for cell in self._cells(center, radius):
+            ids.update(self.cells.get(cell, ()))
+        if not ids:
+            return numpy.zeros(0, dtype=int)
+        ids = numpy.fromiter(ids, dtype=int, count=len(ids))
+        dist = numpy.linalg.norm(self.centers[ids] - center, axis=1)
+        return ids[dist < self.radii[ids] + radius]
+
+    def inner_overlaps(self, center, radius, ids):
+        '''Whether a sphere touches the inscribed sphere of any listed box
+
+        Boxes that pass overlap any box the sphere is inscribed in, whatever
+        the orientations, so the separating axis test can be skipped.
+        '''
+        if len(ids) == 0:
+            return False
+        dist = numpy.linalg.norm(self.centers[ids] - center, axis=1)
+        return bool((dist < self.extents[ids].min(axis=1) + radius).any())
+
+    def overlapping(self, center, axes, extents, ids=None):
+        '''Ids of boxes overlapping the given box
+
+        :ids: (array) result of candidates() for this box, if already known
+        '''
+        center = numpy.asarray(center, dtype=float)
+        if ids is None:
+            ids = self.candidates(center, numpy.linalg.norm(extents))
+        if len(ids) == 0:
+            return ids
+        hit = obb_overlaps(center, numpy.asarray(axes, dtype=float), extents,
+                self.centers[ids], self.axes[ids], self.extents[ids])
+        return ids[hit]
+
+    def overlaps(self, center, axes, extents):
+        return len(self.overlapping(center, axes, extents)) > 0
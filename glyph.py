@@ -24,6 +24,7 @@ import time
 import random
 import importlib
 from mathutils import Vector, Matrix
+from mathutils.bvhtree import BVHTree
 
 sys.path.append('.')
 
@@ -32,16 +33,30 @@ importlib.reload(blender_utils)
 
 NAME_PREFIX = "data_"
 GLYPH_NAME = "data_glyph"
+PREVIEW_SUFFIX = "preview"
+# Float vertex layers carried by the preview point cloud
+PREVIEW_LAYERS = ('value', 'normal_x', 'normal_y', 'normal_z',
+        'gradient_x', 'gradient_y', 'gradient_z')
 
 class Glyph:
-    def __init__(self, value, normal):
+    def __init__(self, value, normal, gradient=None):
         self.value = value
         self.normal = normal
+        self.gradient = gradient
 
 class GlyphGenerator:
-    # :obj: (bpy_struct Object)
+    # Whether _overlaps needs every accepted point passed in
+    keeps_points = True
+
+    # :obj: (bpy_struct Object) mesh to sample glyphs on
     # :value_fn: (function with 3 args)
-    def __init__(self, obj = None, value_fn = None):
+    # :target: (bpy_struct Object) optional full-resolution mesh; when given,
+    # :obj: is treated as a low-poly proxy and accepted glyphs are projected
+    # onto :target:
+    # :preview: (bool) emit an instanced point cloud instead of real glyphs;
+    # call finalize() to build them
+    def __init__(self, obj = None, value_fn = None, target = None,
+            preview = False):
         if obj == None:
             raise ValueError("No object passed in")
         if value_fn == None:
@@ -56,16 +71,39 @@ class GlyphGenerator:
         self.name = str(obj.name)
         self.cutoff = 20
         self.blend_obj = None
+        # Objects built by build_chunk, waiting for join_chunks
+        self.chunk_objs = []
+        self.preview = preview
+        self.preview_obj = None
+        self.target_obj = target
+        self.target_bvh = None
+        if target != None:
+            self.name = str(target.name)
+            self.target_bvh = BVHTree.FromObject(target, bpy.context.scene)
 
         # Find other vertex information
         self.vertex_indices = list(map(lambda v: v.index, self.vertices))
+        self.vertex_positions = {index: i
+                for i, index in enumerate(self.vertex_indices)}
+        self.gradients = None
 
     # Join together all the data glyphs into one object
-    def _join_data(self):
+    # :suffix: (str) optional suffix for the joined object's name
+    # :into: (bpy_struct Object) optional existing glyph object to join into
+    def _join_data(self, suffix=None, into=None):
+        if into != None:
+            bpy.ops.object.select_all(action='DESELECT')
         bpy.ops.object.select_pattern(pattern = GLYPH_NAME + "*")
         bpy.ops.object.convert(target = 'MESH')
+        if into != None:
+            into.select = True
+            bpy.context.scene.objects.active = into
         bpy.ops.object.join()
-        bpy.context.active_object.name = NAME_PREFIX + self.name
+        if into == None:
+            name = NAME_PREFIX + self.name
+            if suffix != None:
+                name += '_' + suffix
+            bpy.context.active_object.name = name
         bpy.ops.object.transform_apply(location = True, rotation = True, scale = True)
         self.blend_obj = bpy.context.active_object
 
@@ -73,8 +111,8 @@ class GlyphGenerator:
     # :vert_index: (int) vertex index of the vertex we're finding coordinates for
     def _find_co(self, vert_index):
         try:
-            desired = self.vertex_indices.index(vert_index)
-        except ValueError:
+            desired = self.vertex_positions[vert_index]
+        except KeyError:
             return (0, 0, 0)
         return tuple(self.vertices[desired].co)
 
@@ -82,62 +120,352 @@ class GlyphGenerator:
     def within_fn(self, existing_point, new_point, current_polygon_vertices):
         return False
 
+    # Glyph for a candidate point sampled on a polygon
+    def _candidate(self, point, poly, vertex_coords):
+        fn_args = list(point) + list([vertex_coords])
+        return Glyph(self.value_fn(*fn_args), poly.normal)
+
+    # Clear any collision state before sampling; implemented by subclasses
+    def _reset_collisions(self):
+        return None
+
+    # Whether a candidate glyph overlaps any accepted one. The default checks
+    # within_fn against every accepted point.
+    def _overlaps(self, point, glyph, points, vertex_coords):
+        for p in points:
+            if self.within_fn(p, point, vertex_coords):
+                return True
+        return False
+
+    # Record an accepted glyph for later collision checks; implemented by
+    # subclasses
+    def _accept(self, point, glyph):
+        return None
+
+    # Forget an accepted glyph's collision state; implemented by subclasses
+    def _release(self, point):
+        return None
+
+    # Make the collision state match an existing glyph set
+    def _sync_collisions(self, points):
+        self._reset_collisions()
+        for point, g in points.items():
+            if g.gradient is None:
+                g.gradient = self._gradient_at(point)
+            self._accept(point, g)
+
+    # Gradients of every vertex, computed together on first use
+    def _gradients(self):
+        if self.gradients is None:
+            self.gradients = blender_utils.vertex_gradients(self.vertices,
+                    self.edges)
+        return self.gradients
+
+    # Gradient at a vertex, by vertex index
+    def _vertex_gradient(self, vertex_index):
+        return Vector(self._gradients()[self.vertex_positions[vertex_index]])
+
+    # Gradient of the mesh at the vertex nearest to a location
+    def _gradient_at(self, location):
+        closest_vertex, _ = blender_utils.nearest_vertex(self.vertices,
+                Vector(location))
+        return Vector(self._gradients()[closest_vertex])
+
     # Implemented by subclasses
     def create_fn(self, points):
         return None
 
-    # Distributes glyphs based on a Poission-Disc algorithm
-    def distribute_poisson(self):
-        print("Generating glyphs on selected mesh.")
-        i = 0
-        start_time = time.time()
-        points_result = {}
-        one_percent = int(len(self.polygons)/100.0) + 1
-        for poly in self.polygons:
-            try:
-                i += 1
-                if i % one_percent == 0:
-                    print("Progress: {:.0%}".format(i / len(self.polygons)))
-                num_within = 0
-                vertex_coords = list(map(lambda vi: self._find_co(vi), poly.vertices))
-                xt = blender_utils.extrema(vertex_coords)
-                while num_within < self.cutoff:
-                    point_inside_poly = blender_utils.random_inside(vertex_coords,
-                            tuple(poly.normal), xt)
-                    if point_inside_poly != None:
-                        add = True
-                        for p in points_result:
-                            # Check if point is within diamater of another
-                            # point (no overlaps allowed)
-                            w = self.within_fn(p, point_inside_poly, vertex_coords)
-                            if w:
-                                add = False
-                                num_within += 1
-                                break
-                        if add:
-                            args = list(point_inside_poly) + \
-                                    [self.value_fn(*point_inside_poly)]
-                            fn_args = list(point_inside_poly) + list([vertex_coords])
-                            points_result[point_inside_poly] = \
-                                    Glyph(self.value_fn(*fn_args), poly.normal)
-                            num_within = 0
-            except KeyboardInterrupt:
-                t1 = time.time()
-                print("\nSampling finished at {:.2f}s".format(t1 - start_time))
-                print("\nGenerated {} glyphs".format(len(points_result)))
-                print("Joining...")
-                self.create_fn(points_result)
-                end_time = time.time()
-                print("Join time {:.2f}s".format(end_time - t1))
-                print("Total time: {:.2f}s".format(end_time - start_time))
-                return points_result
+    # Emit one point-cloud mesh with a vertex per glyph, carrying the glyph
+    # value, normal and gradient in float layers. A small cube is instanced
+    # on every vertex (dupliverts) so placement can be checked cheaply.
+    def _create_preview(self, points):
+        locations = list(points)
+        mesh = bpy.data.meshes.new(NAME_PREFIX + self.name + '_' + PREVIEW_SUFFIX)
+        mesh.from_pydata(locations, [], [])
+        mesh.update()
+
+        columns = {name: [] for name in PREVIEW_LAYERS}
+        for point in locations:
+            g = points[point]
+            if g.gradient is None:
+                g.gradient = self._gradient_at(point)
+            columns['value'].append(g.value)
+            for axis, n, grad in zip('xyz', g.normal, g.gradient):
+                columns['normal_' + axis].append(n)
+                columns['gradient_' + axis].append(grad)
+        for name in PREVIEW_LAYERS:
+            layer = mesh.vertex_layers_float.new(name)
+            for item, value in zip(layer.data, columns[name]):
+                item.value = value
+        # Orients the instances when use_dupli_vertices_rotation is on
+        normals = [c for point in locations for c in points[point].normal]
+        mesh.vertices.foreach_set('normal', normals)
+
+        cloud = bpy.data.objects.new(mesh.name, mesh)
+        bpy.context.scene.objects.link(cloud)
+        cloud.dupli_type = 'VERTS'
+        cloud.use_dupli_vertices_rotation = True
+
+        bpy.ops.mesh.primitive_cube_add(radius=0.5)
+        instance = bpy.context.active_object
+        instance.name = NAME_PREFIX + self.name + '_instance'
+        instance.parent = cloud
+        self.preview_obj = cloud
+        return cloud
+
+    # Read the glyphs back from the preview point cloud
+    def _read_preview(self):
+        mesh = self.preview_obj.data
+        layers = {name: mesh.vertex_layers_float[name].data
+                for name in PREVIEW_LAYERS}
+        points = {}
+        for v in mesh.vertices:
+            i = v.index
+            normal = Vector([layers['normal_' + a][i].value for a in 'xyz'])
+            gradient = Vector([layers['gradient_' + a][i].value for a in 'xyz'])
+            points[tuple(v.co)] = Glyph(layers['value'][i].value, normal, gradient)
+        return points
+
+    # Implemented by subclasses: build real glyph geometry
+    def _build(self, points):
+        return None
+
+    # Remove the preview point cloud and its instanced cube
+    def _delete_preview(self):
+        bpy.ops.object.select_all(action='DESELECT')
+        for child in bpy.context.scene.objects:
+            if child.parent == self.preview_obj:
+                child.select = True
+        self.preview_obj.select = True
+        bpy.ops.object.delete(use_global=False)
+        self.preview_obj = None
 
+    # Implemented by subclasses: replace the geometry of :removed: glyphs
+    # with that of :added: ones, given the full updated set :points:
+    def _rebuild(self, removed, added, points):
+        return None
+
+    # Implemented by subclasses: build glyphs for more points, joining them
+    # into the existing glyph object
+    def _extend(self, points):
+        return None
+
+    # Build the glyphs of one chunk as an object of their own, leaving the
+    # glyph object alone; join_chunks joins them all once sampling is done.
+    # Building runs in lockstep with sampling (bpy isn't thread-safe), so
+    # this keeps each chunk's cost to the chunk's own glyphs.
+    # :points: (dict) glyphs from iter_poisson
+    def build_chunk(self, points):
+        if len(points) == 0:
+            return None
+        built = self.blend_obj
+        bpy.ops.object.select_all(action='DESELECT')
+        self._build(points)
+        chunk = self.blend_obj
+        self.blend_obj = built
+        self.chunk_objs.append(chunk)
+        return chunk
+
+    # Join the objects made by build_chunk, and the glyph object if there
+    # already is one, into the glyph object
+    # :suffix: (str) optional suffix for the joined object's name
+    def join_chunks(self, suffix=None):
+        objs = self.chunk_objs
+        if self.blend_obj != None:
+            objs = [self.blend_obj] + objs
+        if len(objs) == 0:
+            return None
+        bpy.ops.object.select_all(action='DESELECT')
+        for ob in objs:
+            ob.select = True
+        bpy.context.scene.objects.active = objs[0]
+        bpy.ops.object.join()
+        name = NAME_PREFIX + self.name
+        if suffix != None:
+            name += '_' + suffix
+        bpy.context.active_object.name = name
+        self.blend_obj = bpy.context.active_object
+        self.chunk_objs = []
+        return self.blend_obj
+
+    # Build the real glyphs for a preview, and remove the preview
+    def finalize(self):
+        if self.preview_obj is None:
+            raise ValueError("No preview to finalize")
+        points = self._read_preview()
+        self._delete_preview()
+        self.preview = False
+        self._build(points)
+        return points
+
+    # Moves glyphs sampled on the proxy to the closest point on the target.
+    # Glyphs keep their sampled normal and gradient, and the value is mapped
+    # again at the new location. Moved glyphs can collide, so each one is
+    # checked for overlaps again and dropped if it does.
+    # :points: (dict) accepted glyphs to project
+    # :placed: (dict) glyphs already in their final place, which overlap
+    # checks look at; projected glyphs are added to it
+    def _project(self, points, placed=None):
+        if placed == None:
+            placed = {}
+        # Gradients come from the proxy, so take them before moving
+        for point, g in points.items():
+            if g.gradient is None:
+                g.gradient = self._gradient_at(point)
+            placed.pop(point, None)
+            self._release(point)
+
+        target = self.target_obj.data
+        projected = {}
+        for point, g in points.items():
+            co, _, index, _ = self.target_bvh.find_nearest(Vector(point))
+            if co is None:
+                location, vertex_coords = point, []
+            else:
+                location = tuple(co)
+                vertex_coords = [tuple(target.vertices[vi].co)
+                        for vi in target.polygons[index].vertices]
+            fn_args = list(location) + list([vertex_coords])
+            moved = Glyph(self.value_fn(*fn_args), g.normal, g.gradient)
+            # Two glyphs projected onto the same point certainly collide
+            if location in placed or \
+                    self._overlaps(location, moved, placed, vertex_coords):
+                continue
+            placed[location] = moved
+            self._accept(location, moved)
+            projected[location] = moved
+        if len(projected) < len(points):
+            print("Dropped {} glyphs overlapping after projection".format(
+                    len(points) - len(projected)))
+        return projected
+
+    # Projects (if needed) and builds the sampled glyphs
+    def _finish(self, points_result, start_time):
         t1 = time.time()
         print("\nSampling finished at {:.2f}s".format(t1 - start_time))
         print("\nGenerated {} glyphs".format(len(points_result)))
+        if self.target_bvh != None:
+            print("Projecting onto full-resolution mesh...")
+            points_result = self._project(points_result)
         print("Joining...")
         self.create_fn(points_result)
         end_time = time.time()
         print("Join time {:.2f}s".format(end_time - t1))
         print("Total time: {:.2f}s".format(end_time - start_time))
         return points_result
+
+    # Sample one polygon until :cutoff: candidates in a row overlap existing
+    # glyphs. Accepted glyphs are added to :points:; returns their locations.
+    def _sample_polygon(self, poly, points):
+        accepted = []
+        num_within = 0
+        vertex_coords = list(map(lambda vi: self._find_co(vi), poly.vertices))
+        xt = blender_utils.extrema(vertex_coords)
+        while num_within < self.cutoff:
+            point_inside_poly = blender_utils.random_inside(vertex_coords,
+                    tuple(poly.normal), xt)
+            if point_inside_poly != None:
+                g = self._candidate(point_inside_poly, poly, vertex_coords)
+                # No overlaps allowed
+                if self._overlaps(point_inside_poly, g, points, vertex_coords):
+                    num_within += 1
+                else:
+                    points[point_inside_poly] = g
+                    self._accept(point_inside_poly, g)
+                    accepted.append(point_inside_poly)
+                    num_within = 0
+        return accepted
+
+    # Distributes glyphs based on a Poisson-Disc algorithm, yielding the
+    # accepted glyphs in dicts of about :chunk_size: as sampling goes
+    # :project: (bool) project each chunk onto the target mesh, if any
+    def iter_poisson(self, chunk_size=256, project=True):
+        print("Generating glyphs on selected mesh.")
+        self._reset_collisions()
+        # Overlap checks that look at the accepted points need all of them;
+        # otherwise only the current chunk is held
+        seen = {} if self.keeps_points else None
+        chunk = {}
+        one_percent = int(len(self.polygons)/100.0) + 1
+        for i, poly in enumerate(self.polygons, 1):
+            if i % one_percent == 0:
+                print("Progress: {:.0%}".format(i / len(self.polygons)))
+            try:
+                if seen == None:
+                    self._sample_polygon(poly, chunk)
+                else:
+                    for point in self._sample_polygon(poly, seen):
+                        chunk[point] = seen[point]
+            except KeyboardInterrupt:
+                break
+            if len(chunk) >= chunk_size:
+                yield self._project(chunk, seen) \
+                        if project and self.target_bvh != None else chunk
+                chunk = {}
+        if len(chunk) > 0:
+            yield self._project(chunk, seen) \
+                    if project and self.target_bvh != None else chunk
+
+    # Distributes glyphs based on a Poission-Disc algorithm
+    def distribute_poisson(self):
+        start_time = time.time()
+        points_result = {}
+        for chunk in self.iter_poisson(project=False):
+            points_result.update(chunk)
+        return self._finish(points_result, start_time)
+
+    # Re-sample one area of an existing glyph set. Glyphs inside the region
+    # are dropped and the polygons under it are sampled again, checking
+    # overlap against the glyphs that are kept; only the dropped and new
+    # glyphs' geometry is rebuilt.
+    # :points: (dict) glyph set returned by distribute_poisson or resample
+    # :region: ((3 tuple, 3 tuple)) minimum and maximum corners
+    # :polygons: (list of int) polygon indices to re-sample; their bounds
+    # are used as the region when none is given
+    def resample(self, points, region=None, polygons=None):
+        if region == None and polygons == None:
+            raise ValueError("No region or polygons passed in")
+        start_time = time.time()
+        selected = []
+        if polygons != None:
+            wanted = set(polygons)
+            selected = [p for p in self.polygons if p.index in wanted]
+            if len(selected) == 0:
+                raise ValueError("None of the polygons are selected")
+            if region == None:
+                region = blender_utils.extrema([self._find_co(vi)
+                        for p in selected for vi in p.vertices])
+        low, high = region
+
+        def inside(co):
+            return all(l <= c <= h for l, c, h in zip(low, co, high))
+
+        seen = set(p.index for p in selected)
+        selected += [p for p in self.polygons
+                if p.index not in seen and inside(tuple(p.center))]
+
+        self._sync_collisions(points)
+        removed = {p: g for p, g in points.items() if inside(p)}
+        result = {p: g for p, g in points.items() if p not in removed}
+        for point in removed:
+            self._release(point)
+
+        print("Re-sampling {} polygons, dropped {} glyphs".format(
+                len(selected), len(removed)))
+        new_points = []
+        for poly in selected:
+            new_points += self._sample_polygon(poly, result)
+        added = {p: result.pop(p) for p in new_points}
+        if self.target_bvh != None:
+            added = self._project(added, result)
+        result.update(added)
+        print("Added {} glyphs in {:.2f}s".format(len(added),
+                time.time() - start_time))
+
+        if self.preview:
+            if self.preview_obj != None:
+                self._delete_preview()
+            self._create_preview(result)
+        else:
+            self._rebuild(removed, added, result)
+        return result
@@ -21,7 +21,8 @@
 import bpy
 import sys
 import importlib
-from mathutils import Vector
+import numpy
+from mathutils import Vector, Matrix
 
 sys.path.append('.')
 
@@ -36,79 +37,277 @@ from glyph import *
 import blender_utils
 importlib.reload(blender_utils)
 
+import collision
+importlib.reload(collision)
+
+import mesh_helpers
+importlib.reload(mesh_helpers)
+
 class CubeGenerator(GlyphGenerator):
-    '''Generic box-shaped glyphs'''
-    def _create_cube(self, location, value, normal = (0, 0, 0)):
-        bpy.ops.mesh.primitive_cube_add(radius=value, location=location)
+    '''Generic box-shaped glyphs
+
+    Sampling rejects candidates whose oriented box (from the normal, gradient
+    and mapped value) comes within :spacing: of an accepted glyph's box.
+    '''
+    # Clearance kept between neighbouring glyphs
+    spacing = 1.0
+    # Cell size of the spatial hash used for collision checks
+    cell_size = 4.0
+    # Collision state lives in the box index
+    keeps_points = False
+
+    # Scale of each glyph along its local (x, y, z) axes
+    # :values: (N array) mapped glyph values
+    def _glyph_scales(self, values):
+        return numpy.repeat(values[:, None], 3, axis=1)
+
+    # Distance each glyph is pushed out along its normal
+    # :values: (N array) mapped glyph values
+    def _glyph_offsets(self, values):
+        return numpy.zeros(len(values))
+
+    # Offset along the normal and half extents of one glyph's box
+    # :location: (3 tuple) sampled point
+    # :value: (float) mapped glyph value
+    def _box_shape(self, location, value):
+        values = numpy.array([value], dtype=float)
+        return self._glyph_offsets(values)[0], self._glyph_scales(values)[0]
+
+    # Center and padded half extents of a glyph's box. The center is pushed
+    # along the normal only, so it doesn't depend on the gradient.
+    def _box_bounds(self, location, glyph):
+        normal = numpy.array(tuple(glyph.normal), dtype=float)
+        normal /= max(numpy.linalg.norm(normal), 1e-6)
+        offset, extents = self._box_shape(location, glyph.value)
+        center = numpy.array(location, dtype=float) + normal * offset
+        return center, numpy.asarray(extents) + self.spacing / 2
+
+    # Center, axes (columns) and padded half extents of a glyph's box
+    def _glyph_box(self, location, glyph):
+        center, extents = self._box_bounds(location, glyph)
+        frame = blender_utils.gradient_frames([tuple(glyph.normal)],
+                [tuple(glyph.gradient)])[0]
+        return center, frame, extents
+
+    # Candidates carry their gradient so the box can be oriented; it is taken
+    # at the polygon's nearest vertex, from the precomputed vertex gradients
+    def _candidate(self, point, poly, vertex_coords):
+        g = super()._candidate(point, poly, vertex_coords)
+        distances = [sum((a - b)**2 for a, b in zip(co, point))
+                for co in vertex_coords]
+        nearest = poly.vertices[distances.index(min(distances))]
+        g.gradient = self._vertex_gradient(nearest)
+        return g
+
+    def _reset_collisions(self):
+        self.boxes = collision.BoxIndex(self.cell_size)
+        self.box_ids = {}
+        self._last_box = None
+
+    def _overlaps(self, point, glyph, points, vertex_coords):
+        # Bounding and inscribed spheres first; they don't need the box's
+        # orientation
+        center, extents = self._box_bounds(point, glyph)
+        self._last_box = None
+        ids = self.boxes.candidates(center, numpy.linalg.norm(extents))
+        if len(ids) == 0:
+            return False
+        if self.boxes.inner_overlaps(center, extents.min(), ids):
+            return True
+        box = self._glyph_box(point, glyph)
+        self._last_box = (point, box)
+        return len(self.boxes.overlapping(*box, ids=ids)) > 0
+
+    def _accept(self, point, glyph):
+        if self._last_box != None and self._last_box[0] == point:
+            box = self._last_box[1]
+        else:
+            box = self._glyph_box(point, glyph)
+        self.box_ids[point] = self.boxes.insert(*box)
+
+    def _release(self, point):
+        self.boxes.remove(self.box_ids.pop(point))
+
+    # Reuse the index left by the last sampling when it covers the same set
+    def _sync_collisions(self, points):
+        ids = getattr(self, 'box_ids', None)
+        if ids != None and len(ids) == len(points) and \
+                all(p in ids for p in points):
+            return
+        super()._sync_collisions(points)
+
+    # World matrices for every glyph, computed in one batch
+    def _glyph_matrices(self, locations):
+        points = list(locations)
+        values = numpy.array([locations[p].value for p in points], dtype=float)
+        normals = [tuple(locations[p].normal) for p in points]
+        gradients = [tuple(self._gradient_at(p)
+                if locations[p].gradient is None else locations[p].gradient)
+                for p in points]
+        return blender_utils.glyph_transforms(points, normals, gradients,
+                self._glyph_scales(values), self._glyph_offsets(values))
+
+    def _create_cube(self, location, matrix):
+        bpy.ops.mesh.primitive_cube_add(radius=1, location=location)
         ob = bpy.context.active_object
         ob.name = GLYPH_NAME
-        closest_vertex, _ = nearest_vertex(self.vertices, Vector(location))
-        gradient = gradient_at_vertex_2(self.edges, self.vertices, closest_vertex)
-        blender_utils.rotate_obj_gradient(ob, normal, gradient)
+        ob.matrix_world = Matrix(matrix.tolist())
 
-    def _create_cubes(self, locations):
+    def _create_cubes(self, locations, suffix=None):
         total = len(locations)
+        matrices = self._glyph_matrices(locations)
         for (i, point) in enumerate(locations):
             print("Progress: {:.0%}".format(i / total))
-            self._create_cube(point, locations[point].value, locations[point].normal)
-        self._join_data()
+            self._create_cube(point, matrices[i])
+        self._join_data(suffix)
 
-    def create_fn(self, points):
+    def _build(self, points):
         return self._create_cubes(points)
 
+    # Delete the cubes of some glyphs from the joined glyph object. Each cube
+    # is a separate mesh island centered on its glyph's box; raises
+    # ValueError, and leaves the mesh alone, if any glyph has no island
+    # within :tolerance:
+    def _delete_glyphs(self, locations, tolerance=1e-3):
+        obj = self.blend_obj
+        arrays = mesh_helpers.mesh_arrays(obj)
+        labels = mesh_helpers.vertex_islands(arrays)
+        counts = numpy.bincount(labels, minlength=len(labels))
+        centroids = numpy.zeros((len(labels), 3))
+        numpy.add.at(centroids, labels, arrays['co'])
+        centroids /= numpy.maximum(counts, 1)[:, None]
+        islands = numpy.where(counts > 0)[0]
+
+        doomed = numpy.zeros(len(labels), dtype=bool)
+        centers = self._glyph_matrices(locations)[:, :3, 3]
+        for center in centers:
+            d = ((centroids[islands] - center)**2).sum(axis=1)
+            if len(d) == 0 or d.min() > tolerance**2:
+                raise ValueError('No glyph built at {}'.format(tuple(center)))
+            doomed[islands[d.argmin()]] = True
+
+        mesh_helpers.select_all(obj, False)
+        for i in numpy.where(doomed[labels])[0]:
+            obj.data.vertices[int(i)].select = True
+        bpy.ops.object.select_all(action='DESELECT')
+        bpy.context.scene.objects.active = obj
+        mesh_helpers.delete_verts(obj)
+
+    def _rebuild(self, removed, added, points):
+        if self.blend_obj == None:
+            return self._build(points)
+        if len(removed) > 0:
+            self._delete_glyphs(removed)
+        self._extend(added)
+
+    def _extend(self, points, suffix=None):
+        if len(points) == 0:
+            return
+        matrices = self._glyph_matrices(points)
+        for (i, point) in enumerate(points):
+            self._create_cube(point, matrices[i])
+        self._join_data(suffix, into=self.blend_obj)
+
+    def create_fn(self, points):
+        if self.preview:
+            return self._create_preview(points)
+        return self._build(points)
+
 class HeightCubeGenerator(CubeGenerator):
     '''Glyphs based on height'''
-    def _create_cube(self, location, value, normal=(0, 0, 0)):
-        bpy.ops.mesh.primitive_cube_add(radius=1, location=location)
-        ob = bpy.context.active_object
-        ob.name = GLYPH_NAME
-        closest_vertex, _ = nearest_vertex(self.vertices, Vector(location))
-        gradient = gradient_at_vertex_2(self.edges, self.vertices, closest_vertex)
-        blender_utils.rotate_obj_gradient(ob, normal, gradient)
-        ob.scale[0] = 0.75
-        ob.scale[1] = 0.75
-        ob.scale[2] = value * 1.15
-        ob.location += 0.85 * value * Vector(normal)
-
-    def within_fn(self, existing_point, new_point, current_polygon_vertices):
-        # Radius is 1; use 3 for buffer
-        return blender_utils.within_cube(existing_point, new_point, 4)
+    def _glyph_scales(self, values):
+        scales = numpy.empty((len(values), 3))
+        scales[:, :2] = 0.75
+        scales[:, 2] = values * 1.15
+        return scales
+
+    def _glyph_offsets(self, values):
+        return 0.85 * values
 
 class LengthCubeGenerator(CubeGenerator):
     '''Glyphs following the gradient'''
-    def _create_cube(self, location, value, normal=(0, 0, 0)):
-        bpy.ops.mesh.primitive_cube_add(radius=1, location=location)
-        ob = bpy.context.active_object
-        ob.name = GLYPH_NAME
-        closest_vertex, _ = nearest_vertex(self.vertices, Vector(location))
-        gradient = gradient_at_vertex_2(self.edges, self.vertices, closest_vertex)
-        blender_utils.rotate_obj_gradient(ob, normal, gradient)
-        ob.scale[1] = value
-
-    def within_fn(self, existing_point, new_point, current_polygon_vertices):
-        fn_args = list(new_point) + list([current_polygon_vertices])
-        value = self.value_fn(*fn_args)
-        return blender_utils.within_cube(existing_point, new_point, 5)
+    def _glyph_scales(self, values):
+        scales = numpy.ones((len(values), 3))
+        scales[:, 1] = values
+        return scales
 
 class LengthCubeGenerator2(CubeGenerator):
     '''Glyphs following the perpendicular gradient'''
-    def _create_cube(self, location, value, normal=(0, 0, 0)):
-        bpy.ops.mesh.primitive_cube_add(radius=1, location=location)
-        ob = bpy.context.active_object
-        ob.name = GLYPH_NAME
-        closest_vertex, _ = nearest_vertex(self.vertices, Vector(location))
-        gradient = gradient_at_vertex_2(self.edges, self.vertices, closest_vertex)
-        blender_utils.rotate_obj_gradient(ob, normal, gradient)
-        ob.scale[0] = value
-
-    def within_fn(self, existing_point, new_point, current_polygon_vertices):
-        fn_args = list(new_point) + list([current_polygon_vertices])
-        value = self.value_fn(*fn_args)
-        return blender_utils.within_cube(existing_point, new_point, 5)
+    def _glyph_scales(self, values):
+        scales = numpy.ones((len(values), 3))
+        scales[:, 0] = values
+        return scales
 
 class SizeCubeGenerator(CubeGenerator):
-    def within_fn(self, existing_point, new_point, current_polygon_vertices):
-        fn_args = list(new_point) + list([current_polygon_vertices])
-        value = 2.5*self.value_fn(*fn_args)
-        recip_value = 1/value
-        return blender_utils.within_cube(existing_point, new_point, value + recip_value)
+    '''Glyphs scaled uniformly by value'''
+
+class SharedCubeGenerator(CubeGenerator):
+    '''Samples one glyph set and builds it with several encodings
+
+    :encodings: (list of (CubeGenerator subclass, value function)) each
+    encoding is rendered from the shared set into its own object
+    '''
+    def __init__(self, obj = None, encodings = None, target = None,
+            preview = False):
+        if not encodings:
+            raise ValueError("No encodings passed in")
+        self.generators = [cls(obj, value_fn) for cls, value_fn in encodings]
+        # Values stored on the shared glyphs come from the first encoding;
+        # every encoding re-maps the locations with its own value function
+        super().__init__(obj, self.generators[0].value_fn, target, preview)
+        for g in self.generators:
+            g.name = self.name
+        self.blend_objs = []
+
+    # Most conservative footprint: the box enclosing every encoding's box.
+    # Encodings share the frame and only offset along the normal, so this is
+    # the widest extent in x and y and the full span along z.
+    def _box_shape(self, location, value):
+        shapes = [g._box_shape(location, g.value_fn(*location))
+                for g in self.generators]
+        offsets = numpy.array([offset for offset, _ in shapes])
+        extents = numpy.array([e for _, e in shapes])
+        low = (offsets - extents[:, 2]).min()
+        high = (offsets + extents[:, 2]).max()
+        envelope = extents.max(axis=0)
+        envelope[2] = (high - low) / 2
+        return (high + low) / 2, envelope
+
+    # The glyphs with values from one encoding's value function
+    def _remap(self, g, points):
+        return {point: Glyph(g.value_fn(*point), points[point].normal,
+                points[point].gradient) for point in points}
+
+    def _build(self, points):
+        self.blend_objs = []
+        for g in self.generators:
+            print("Building {} glyphs".format(type(g).__name__))
+            g._create_cubes(self._remap(g, points), type(g).__name__)
+            self.blend_objs.append(g.blend_obj)
+        self.blend_obj = self.blend_objs[0]
+
+    def _rebuild(self, removed, added, points):
+        if self.blend_obj == None:
+            return self._build(points)
+        for g in self.generators:
+            g._rebuild(self._remap(g, removed), self._remap(g, added),
+                    self._remap(g, points))
+        self.blend_objs = [g.blend_obj for g in self.generators]
+        self.blend_obj = self.blend_objs[0]
+
+    def _extend(self, points):
+        for g in self.generators:
+            g._extend(self._remap(g, points), type(g).__name__)
+        self.blend_objs = [g.blend_obj for g in self.generators]
+        self.blend_obj = self.blend_objs[0]
+
+    def build_chunk(self, points):
+        for g in self.generators:
+            g.build_chunk(self._remap(g, points))
+
+    def join_chunks(self, suffix=None):
+        for g in self.generators:
+            g.join_chunks(type(g).__name__)
+        self.blend_objs = [g.blend_obj for g in self.generators]
+        self.blend_obj = self.blend_objs[0]
+        return self.blend_obj
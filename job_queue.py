@@ -0,0 +1,213 @@
+#  Copyright 2018 Bridger Herman
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Local file-based job queue shared by worker.py and its clients. This
+# module does not import bpy, so it can be used from any Python.
+#
+# Layout of a queue directory:
+#   tmp/      jobs and results being written
+#   pending/  submitted jobs, claimed in name (submission) order
+#   running/  jobs claimed by a worker; the file's mtime is the worker's
+#             last heartbeat
+#   done/     results, one per job id
+#
+# A worker that dies mid-job (Blender can crash in booleans) stops beating.
+# claim() moves such stale jobs back to pending, and gives up on a job with
+# an error result once it has taken down MAX_ATTEMPTS workers.
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+
+# Seconds without a heartbeat before a running job is considered abandoned
+STALE_AFTER = 120
+# Seconds between heartbeats; well under STALE_AFTER
+HEARTBEAT_INTERVAL = 10
+MAX_ATTEMPTS = 3
+# Seconds JobClient waits for a result by default
+DEFAULT_TIMEOUT = 3600
+
+class _Heartbeat:
+    '''Context manager touching a running job from a background thread'''
+    def __init__(self, queue, job_id, interval):
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.queue.heartbeat(self.job_id)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+class JobQueue:
+    '''A job queue backed by a local directory
+
+    Every state change is an os.rename, so any number of workers and
+    clients can share one directory.
+    '''
+    def __init__(self, path):
+        self.path = path
+        for d in ('tmp', 'pending', 'running', 'done'):
+            os.makedirs(os.path.join(path, d), exist_ok=True)
+
+    def _dir(self, state, name=''):
+        return os.path.join(self.path, state, name)
+
+    def _write(self, state, name, data):
+        tmp = self._dir('tmp', name)
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp, self._dir(state, name))
+
+    def submit(self, job):
+        '''Queue a job (dict) and return its id'''
+        job_id = '{:020d}-{}'.format(int(time.time() * 1e6), uuid.uuid4().hex)
+        job = dict(job, id=job_id)
+        self._write('pending', job_id + '.json', job)
+        return job_id
+
+    def claim(self, stale_after=STALE_AFTER):
+        '''Take the oldest pending job, or None if there are none
+
+        Jobs whose worker stopped beating for :stale_after: seconds are
+        requeued first (pass None to skip that).
+        '''
+        if stale_after != None:
+            self.requeue_stale(stale_after)
+        for name in sorted(os.listdir(self._dir('pending'))):
+            try:
+                # rename keeps the mtime, so this is the first heartbeat
+                os.utime(self._dir('pending', name), None)
+                os.rename(self._dir('pending', name), self._dir('running', name))
+            except OSError:
+                # Another worker got there first
+                continue
+            with open(self._dir('running', name)) as f:
+                return json.load(f)
+        return None
+
+    def heartbeat(self, job_id):
+        '''Mark a claimed job as still being worked on'''
+        try:
+            os.utime(self._dir('running', job_id + '.json'), None)
+        except OSError:
+            pass
+
+    def keep_alive(self, job_id, interval=HEARTBEAT_INTERVAL):
+        '''Context manager that beats for a job while its body runs'''
+        return _Heartbeat(self, job_id, interval)
+
+    def requeue_stale(self, stale_after=STALE_AFTER, max_attempts=MAX_ATTEMPTS):
+        '''Move running jobs with no recent heartbeat back to pending
+
+        Returns the ids of the jobs that were requeued or failed.
+        '''
+        now = time.time()
+        moved = []
+        for name in os.listdir(self._dir('running')):
+            path = self._dir('running', name)
+            try:
+                if now - os.path.getmtime(path) < stale_after:
+                    continue
+                # Take the job out of running/ so only one caller handles it
+                tmp = self._dir('tmp', name + '.' + uuid.uuid4().hex)
+                os.rename(path, tmp)
+            except OSError:
+                continue
+            with open(tmp) as f:
+                job = json.load(f)
+            os.remove(tmp)
+            job['attempts'] = job.get('attempts', 0) + 1
+            if job['attempts'] >= max_attempts:
+                self._write('done', name, {'id': job['id'], 'status': 'error',
+                        'error': 'Worker stopped responding {} times'.format(
+                        job['attempts'])})
+            else:
+                # Same name, so the job keeps its place in the queue
+                self._write('pending', name, job)
+            moved.append(job['id'])
+        return moved
+
+    def finish(self, job_id, result):
+        '''Publish the result (dict) of a claimed job'''
+        self._write('done', job_id + '.json', dict(result, id=job_id))
+        try:
+            os.remove(self._dir('running', job_id + '.json'))
+        except OSError:
+            pass
+
+    def result(self, job_id):
+        '''Result of a job, or None if it hasn't finished'''
+        try:
+            with open(self._dir('done', job_id + '.json')) as f:
+                return json.load(f)
+        except (IOError, OSError):
+            return None
+
+class JobClient:
+    '''asyncio client for submitting jobs to warm workers
+
+    Example, keeping every worker on the queue busy:
+
+        client = JobClient('/tmp/potato_queue')
+        loop = asyncio.get_event_loop()
+        results = loop.run_until_complete(client.run_all(jobs))
+    '''
+    def __init__(self, path, poll_interval=0.25):
+        self.queue = JobQueue(path)
+        self.poll_interval = poll_interval
+
+    async def submit(self, job):
+        return self.queue.submit(job)
+
+    async def wait(self, job_id, timeout=DEFAULT_TIMEOUT):
+        '''Wait for a job's result; raises asyncio.TimeoutError on timeout
+
+        :timeout: (float) seconds, or None to wait forever
+        '''
+        start = time.time()
+        while True:
+            result = self.queue.result(job_id)
+            if result != None:
+                return result
+            if timeout != None and time.time() - start > timeout:
+                raise asyncio.TimeoutError(job_id)
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(self, job, timeout=DEFAULT_TIMEOUT):
+        job_id = await self.submit(job)
+        return await self.wait(job_id, timeout)
+
+    async def run_all(self, jobs, timeout=DEFAULT_TIMEOUT):
+        return await asyncio.gather(*[self.run(job, timeout) for job in jobs])
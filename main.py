@@ -40,6 +40,16 @@ import mesh_helpers
 importlib.reload(mesh_helpers)
 from mesh_helpers import *
 
+import printability
+importlib.reload(printability)
+
+import pipeline
+importlib.reload(pipeline)
+
+# Only place instanced glyph markers, for tuning the sizes and mapper.
+# Once happy, call finalize(p, g) with the returned potato and generator.
+PREVIEW = False
+
 def main():
     # Define the glyph sizes
     # Based on viewing angle at 25cm, from Li et al. 2010
@@ -49,6 +59,8 @@ def main():
     length_range2 = (1, 3.5)
 
     p = Potato()
+    # Smooth noise-based shape; no smoothing pass needed
+    #  p = NoisePotato(amplitude=25, octaves=4)
     p.generate()
 
     minm, maxm = p.bound_box
@@ -72,13 +84,61 @@ def main():
 
     # Radius-based glyphs
     m = LinearMapper3D(*bundle, output_range=radius_range, num_bins=8)
-    g = SizeCubeGenerator(p.blend_obj, m.map)
+    # Equal share of the surface per bin, for skewed fields
+    #  m = QuantileMapper3D(p.blend_obj, f, output_range=radius_range, num_bins=8)
+    g = SizeCubeGenerator(p.blend_obj, m.map, preview=PREVIEW)
+
+    # All encodings from a single sampling pass, one object per encoding
+    #  encodings = [
+    #      (LengthCubeGenerator, LinearMapper3D(*bundle,
+    #          output_range=length_range, num_bins=8).map),
+    #      (LengthCubeGenerator2, LinearMapper3D(*bundle,
+    #          output_range=length_range2, num_bins=8).map),
+    #      (HeightCubeGenerator, LinearMapper3D(*bundle,
+    #          output_range=height_range, num_bins=8).map),
+    #      (SizeCubeGenerator, LinearMapper3D(*bundle,
+    #          output_range=radius_range, num_bins=8).map),
+    #  ]
+    #  g = SharedCubeGenerator(p.blend_obj, encodings)
+
+    # Faster sampling on a low-poly proxy; glyphs are projected back onto
+    # the full-resolution potato. g keeps sampling on the proxy's mesh, so
+    # delete the proxy only after any re-sampling (see below)
+    #  proxy = p.make_proxy(ratio=0.1)
+    #  g = SizeCubeGenerator(proxy, m.map, target=p.blend_obj)
 
     # Distribute the points on the potato. This might take a while
     points = g.distribute_poisson()
+    # Or build in chunks while streaming the glyphs to disk
+    #  pipeline.run_pipeline(g, [pipeline.PlyWriter('/tmp/glyphs.ply')])
+
+    # Re-sample a badly packed area, keeping the rest of the glyphs
+    #  points = g.resample(points, region=((-5, -5, 10), (5, 5, 20)))
+
+    # Remove the low-poly proxy, if one was used, once done re-sampling
+    #  delete_obj(proxy)
+
+    if not PREVIEW:
+        finalize(p, g)
+    return p, g
+
+def finalize(p, g):
+    # Build the real glyphs if they were only previewed
+    if g.preview_obj != None:
+        g.finalize()
+    glyph_objs = getattr(g, 'blend_objs', [g.blend_obj])
+    footprints = [printability.glyph_footprints(o) for o in glyph_objs]
 
     # Take the difference of the skyscrapers and the potato
-    boolean_op(g.blend_obj, p.blend_obj, 'DIFFERENCE')
+    for glyph_obj in glyph_objs:
+        boolean_op(glyph_obj, p.blend_obj, 'DIFFERENCE')
+
+    # Check the models can be printed, and find glyphs the difference
+    # (almost) swallowed. The halves are open along the cut by design, so
+    # check the whole objects before slicing
+    reports = [printability.analyze(p.blend_obj)]
+    reports += [printability.analyze(o, footprints=f)
+            for o, f in zip(glyph_objs, footprints)]
 
     # Do some magic to prevent Python from modifying the bounding box while
     # slicing the potato in half
@@ -87,7 +147,11 @@ def main():
 
     # Non-destructively slice both the potato and the glyphs in half
     slice_obj(p.blend_obj, True, op='INTERSECT', bound_box=bbox)
-    slice_obj(g.blend_obj, True, op='DIFFERENCE', bound_box=bbox)
+    for glyph_obj in glyph_objs:
+        slice_obj(glyph_obj, True, op='DIFFERENCE', bound_box=bbox)
+
+    printability.print_reports(reports)
+    return reports
 
 if __name__ == '__main__':
     main()
@@ -18,6 +18,8 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #  SOFTWARE.
 
+import bisect
+import random
 import importlib
 
 class Mapper:
@@ -113,3 +115,98 @@ class LinearMapper3D(Mapper):
                     value = self.bins[(bmin, bmax)]
                     break
         return self.a*value + self.b
+
+class QuantileMapper3D(Mapper):
+    '''Maps values so that each bin covers an equal share of the surface
+
+    The field is sampled once over the mesh surface (stratified by area)
+    and its quantiles become a lookup table of bin edges, so map is a
+    binary search. Drop-in replacement for LinearMapper3D.map.
+
+    :obj: (bpy_struct Object) mesh the glyphs will be placed on
+    :seed: (int) seed for a private random stream; by default the module
+    level one is used, so random.seed makes the bins reproducible
+    '''
+    def __init__(self, obj, fn, output_range, num_bins=8, samples=4096,
+            seed=None):
+        super().__init__()
+        self.obj = obj
+        self.fn = fn
+        self.output_range = output_range
+        self.num_bins = num_bins
+        self.samples = samples
+        self.rng = random if seed == None else random.Random(seed)
+        self.values = None
+        self.edges = None
+        self.outputs = None
+
+    def _triangles(self):
+        vertices = self.obj.data.vertices
+        for poly in self.obj.data.polygons:
+            vs = poly.vertices
+            a = tuple(vertices[vs[0]].co)
+            for i in range(1, len(vs) - 1):
+                yield a, tuple(vertices[vs[i]].co), tuple(vertices[vs[i + 1]].co)
+
+    # Stratified samples of the field over the surface: one sample in each
+    # of :samples: equal-area strata
+    def sample_surface(self):
+        triangles = []
+        areas = []
+        for a, b, c in self._triangles():
+            ab = [q - p for p, q in zip(a, b)]
+            ac = [q - p for p, q in zip(a, c)]
+            cross = (ab[1]*ac[2] - ab[2]*ac[1], ab[2]*ac[0] - ab[0]*ac[2],
+                    ab[0]*ac[1] - ab[1]*ac[0])
+            triangles.append((a, ab, ac))
+            areas.append(sum(x*x for x in cross)**0.5 / 2)
+        total = sum(areas)
+        if total == 0:
+            raise ValueError('Mesh has no surface to sample')
+
+        values = []
+        stratum = total / self.samples
+        cumulative = 0
+        t = 0
+        for k in range(self.samples):
+            target = (k + self.rng.random()) * stratum
+            while t < len(areas) - 1 and cumulative + areas[t] < target:
+                cumulative += areas[t]
+                t += 1
+            # Uniform point in the triangle
+            u, v = self.rng.random(), self.rng.random()
+            if u + v > 1:
+                u, v = 1 - u, 1 - v
+            a, ab, ac = triangles[t]
+            point = [p + u*e1 + v*e2 for p, e1, e2 in zip(a, ab, ac)]
+            values.append(self.fn(*point))
+        return sorted(values)
+
+    # Surface samples, taken on first use
+    def get_values(self):
+        if self.values == None:
+            self.values = self.sample_surface()
+        return self.values
+
+    def get_bounds(self):
+        values = self.get_values()
+        return values[0], values[-1]
+
+    def get_coefficients(self):
+        values = self.get_values()
+        n = len(values)
+        # Interior bin edges at the quantiles
+        self.edges = [values[(i * n) // self.num_bins]
+                for i in range(1, self.num_bins)]
+        desired_min, desired_max = self.output_range
+        step = (desired_max - desired_min) / max(self.num_bins - 1, 1)
+        self.outputs = [desired_min + i * step for i in range(self.num_bins)]
+        self.have_coefficients = True
+        print(0, "Quantile bin edges: " +
+                ", ".join("{:.4f}".format(e) for e in self.edges))
+        return self.edges, self.outputs
+
+    def map(self, x, y, z, *args):
+        if not self.have_coefficients:
+            self.get_coefficients()
+        return self.outputs[bisect.bisect_right(self.edges, self.fn(x, y, z))]
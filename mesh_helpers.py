@@ -21,6 +21,7 @@
 import bpy
 from mathutils import Vector
 import math
+import numpy
 
 def boolean_op(obj1, obj2, op, delete_obs=(False, False)):
     '''Perform a boolean modifier on 2 objects
@@ -51,6 +52,27 @@ def boolean_op(obj1, obj2, op, delete_obs=(False, False)):
         bpy.ops.object.delete(use_global=False)
     print("Finished\n")
 
+def decimate_obj(obj, ratio, name=None):
+    '''Make a decimated copy of an object, with all its polygons selected'''
+    bpy.ops.object.select_all(action='DESELECT')
+    bpy.context.scene.objects.active = obj
+    obj.select = True
+    bpy.ops.object.duplicate()
+    proxy = bpy.context.active_object
+    bpy.ops.object.modifier_add(type='DECIMATE')
+    bpy.context.object.modifiers["Decimate"].ratio = ratio
+    bpy.ops.object.modifier_apply(apply_as='DATA', modifier="Decimate")
+    select_all(proxy, True)
+    if name != None:
+        proxy.name = name
+    return proxy
+
+def delete_obj(obj):
+    '''Delete a single object from the scene'''
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select = True
+    bpy.ops.object.delete(use_global=False)
+
 def slice_obj(obj1, move=False, op='INTERSECT', destructive=False,
         bound_box=None, cutoff_buffer=0.01):
     '''Slice an object along the xy-plane
@@ -124,3 +146,44 @@ def delete_verts(obj):
     bpy.ops.object.mode_set(mode='EDIT')
     bpy.ops.mesh.delete(type='VERT')
     bpy.ops.object.mode_set(mode='OBJECT')
+
+def mesh_arrays(obj):
+    '''Vertex coordinates and normals, edges and polygon loops as arrays'''
+    mesh = obj.data
+    nv, ne, nl, npoly = (len(mesh.vertices), len(mesh.edges), len(mesh.loops),
+            len(mesh.polygons))
+    co = numpy.empty(nv * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get('co', co)
+    normals = numpy.empty(nv * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get('normal', normals)
+    edges = numpy.empty(ne * 2, dtype=numpy.int32)
+    mesh.edges.foreach_get('vertices', edges)
+    loops = numpy.empty(nl, dtype=numpy.int32)
+    mesh.loops.foreach_get('vertex_index', loops)
+    starts = numpy.empty(npoly, dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_start', starts)
+    totals = numpy.empty(npoly, dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_total', totals)
+    return {
+        'co': co.reshape(-1, 3).astype(float),
+        'normals': normals.reshape(-1, 3).astype(float),
+        'edges': edges.reshape(-1, 2).astype(numpy.int64),
+        'loops': loops.astype(numpy.int64),
+        'loop_start': starts.astype(numpy.int64),
+        'loop_total': totals.astype(numpy.int64),
+    }
+
+def vertex_islands(arrays):
+    '''Connected component label of every vertex'''
+    labels = numpy.arange(len(arrays['co']))
+    a, b = arrays['edges'][:, 0], arrays['edges'][:, 1]
+    while True:
+        low = numpy.minimum(labels[a], labels[b])
+        new = labels.copy()
+        numpy.minimum.at(new, a, low)
+        numpy.minimum.at(new, b, low)
+        # Pointer jumping to collapse label chains quickly
+        new = new[new]
+        if numpy.array_equal(new, labels):
+            return labels
+        labels = new
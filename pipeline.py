@@ -0,0 +1,180 @@
+#  Copyright 2018 Bridger Herman
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Streams glyphs from sampling to geometry and disk in chunks, so nothing
+# holds the whole glyph set. bpy is not thread-safe: sampling and mesh
+# building run in lockstep, chunk by chunk on the main thread, and only the
+# writers run on a background thread fed through a bounded queue. Each
+# chunk is built as its own object and the objects are joined once at the
+# end, so building a chunk doesn't touch the glyphs built before it.
+
+import sys
+import json
+import time
+import queue
+import importlib
+import threading
+
+import numpy
+from mathutils import Vector
+
+sys.path.append('.')
+
+import glyph
+importlib.reload(glyph)
+Glyph = glyph.Glyph
+
+# Columns of a glyph block
+FIELDS = ('x', 'y', 'z', 'nx', 'ny', 'nz', 'gx', 'gy', 'gz', 'value')
+
+def glyph_array(points):
+    '''N x 10 array of glyph locations, normals, gradients and values'''
+    block = numpy.zeros((len(points), len(FIELDS)))
+    for i, point in enumerate(points):
+        g = points[point]
+        block[i, 0:3] = point
+        block[i, 3:6] = tuple(g.normal)
+        if g.gradient is not None:
+            block[i, 6:9] = tuple(g.gradient)
+        block[i, 9] = g.value
+    return block
+
+def array_glyphs(block):
+    '''Glyph dict from an array made by glyph_array'''
+    return {tuple(row[0:3]): Glyph(float(row[9]), Vector(row[3:6]),
+            Vector(row[6:9])) for row in block}
+
+class PlyWriter:
+    '''Binary little-endian PLY point cloud, one vertex per glyph
+
+    The vertex count is unknown until the stream ends, so the header is
+    written with a fixed-width count and rewritten on close.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path, 'wb')
+        self.file.write(self._header())
+
+    def _header(self):
+        lines = ['ply', 'format binary_little_endian 1.0',
+                'element vertex {:010d}'.format(self.count)]
+        lines += ['property float {}'.format(f) for f in FIELDS]
+        lines.append('end_header')
+        return ('\n'.join(lines) + '\n').encode('ascii')
+
+    def write(self, block):
+        self.file.write(block.astype('<f4').tobytes())
+        self.count += len(block)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(self._header())
+        self.file.close()
+
+class CheckpointWriter:
+    '''Point set checkpoint, one JSON line per chunk
+
+    Every chunk is flushed as it arrives, so the glyphs of an interrupted
+    run can still be built (see read_checkpoint and array_glyphs).
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+
+    def write(self, block):
+        self.file.write(json.dumps(block.tolist()) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def read_checkpoint(path):
+    '''Glyph array from a checkpoint, ignoring a partly written last chunk'''
+    blocks = []
+    with open(path) as f:
+        for line in f:
+            try:
+                blocks.append(numpy.array(json.loads(line), dtype=float)
+                        .reshape(-1, len(FIELDS)))
+            except ValueError:
+                break
+    if len(blocks) == 0:
+        return numpy.zeros((0, len(FIELDS)))
+    return numpy.concatenate(blocks)
+
+def _write_blocks(blocks, writers, errors):
+    while True:
+        block = blocks.get()
+        if block is None:
+            return
+        # Keep draining after an error so the producer never blocks
+        if len(errors) > 0:
+            continue
+        try:
+            for w in writers:
+                w.write(block)
+        except Exception as e:
+            errors.append(e)
+
+def run_pipeline(g, writers=(), chunk_size=256, build=True, queue_size=4):
+    '''Sample a generator's glyphs and stream them through the stages
+
+    Each chunk is built right after it is sampled, in lockstep on this
+    thread; only the writers overlap with sampling and building.
+
+    :g: (GlyphGenerator) not in preview mode
+    :writers: (list) objects with write(block) and close(), e.g. PlyWriter
+    :chunk_size: (int) glyphs per chunk
+    :build: (bool) build each chunk's glyphs as its own object, joined
+    into g.blend_obj once sampling is done
+    :queue_size: (int) chunks that may wait for the writers before
+    sampling pauses
+    Returns the number of glyphs
+    '''
+    if g.preview:
+        raise ValueError("Streaming builds real glyphs; turn preview off")
+    start_time = time.time()
+    blocks = queue.Queue(maxsize=queue_size)
+    errors = []
+    thread = threading.Thread(target=_write_blocks,
+            args=(blocks, writers, errors))
+    thread.start()
+    total = 0
+    try:
+        for chunk in g.iter_poisson(chunk_size):
+            if len(errors) > 0:
+                break
+            blocks.put(glyph_array(chunk))
+            if build:
+                g.build_chunk(chunk)
+            total += len(chunk)
+        if build:
+            g.join_chunks()
+    finally:
+        blocks.put(None)
+        thread.join()
+        for w in writers:
+            w.close()
+    if len(errors) > 0:
+        raise errors[0]
+    print("Streamed {} glyphs in {:.2f}s".format(total,
+            time.time() - start_time))
+    return total
@@ -22,7 +22,9 @@ import bpy
 import sys
 import math
 import random
+import itertools
 import importlib
+import numpy
 from mathutils import Vector
 
 # Other imports
@@ -30,7 +32,7 @@ sys.path.append(".")
 
 import mesh_helpers
 importlib.reload(mesh_helpers)
-from mesh_helpers import make_tag
+from mesh_helpers import decimate_obj
 
 # Get the spherical coordinates of an (x, y, z) coordinate
 def _to_spherical(co):
@@ -49,6 +51,51 @@ def _to_xyz(co):
     z = r * math.cos(phi)
     return Vector((x, y, z))
 
+# Gradient directions for 3D Perlin noise (cube edge midpoints)
+_GRADIENTS = numpy.array([
+    (1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0),
+    (1, 0, 1), (-1, 0, 1), (1, 0, -1), (-1, 0, -1),
+    (0, 1, 1), (0, -1, 1), (0, 1, -1), (0, -1, -1),
+], dtype=float)
+
+# 3D Perlin gradient noise, roughly in [-1, 1]
+# :points: (N x 3 array)
+# :perm: (array) permutation of range(256)
+def _gradient_noise(points, perm):
+    cell = numpy.floor(points)
+    f = points - cell
+    cell = cell.astype(int)
+    fade = f * f * f * (f * (f * 6 - 15) + 10)
+    result = numpy.zeros(len(points))
+    for corner in itertools.product((0, 1), repeat=3):
+        c = cell + corner
+        h = perm[(perm[(perm[c[:, 0] & 255] + c[:, 1]) & 255] + c[:, 2]) & 255]
+        dot = (_GRADIENTS[h % 12] * (f - corner)).sum(axis=1)
+        weight = numpy.ones(len(points))
+        for axis in range(3):
+            weight *= fade[:, axis] if corner[axis] else 1 - fade[:, axis]
+        result += weight * dot
+    return result
+
+# Fractal Brownian motion: octaves of gradient noise, normalized to [-1, 1]
+def _fbm(points, seed, octaves=4, lacunarity=2.0, gain=0.5):
+    rng = numpy.random.RandomState(seed)
+    perm = rng.permutation(256)
+    total = numpy.zeros(len(points))
+    amplitude, frequency, norm = 1.0, 1.0, 0.0
+    for _ in range(octaves):
+        # Shift each octave so their lattices don't line up
+        offset = rng.uniform(0, 256, 3)
+        total += amplitude * _gradient_noise(points * frequency + offset, perm)
+        norm += amplitude
+        amplitude *= gain
+        frequency *= lacunarity
+    return total / norm
+
+def _smoothstep(t):
+    t = numpy.clip(t, 0, 1)
+    return t * t * (3 - 2 * t)
+
 class Potato:
     '''A randomly generated potato blob'''
     NUM_POTATOES = 0
@@ -82,7 +129,19 @@ class Potato:
                 segments=self.resolution,
                 ring_count=self.resolution//2)
         self.blend_obj = bpy.context.active_object
-        vertices = self.blend_obj.data.vertices
+        self._displace(self.blend_obj.data.vertices)
+
+        # Smooth it up
+        if self.smooth_steps > 0:
+            bpy.ops.object.modifier_add(type='SMOOTH')
+            bpy.context.object.modifiers["Smooth"].factor = self.smooth_factor
+            bpy.context.object.modifiers["Smooth"].iterations = self.smooth_steps
+            bpy.ops.object.modifier_apply(apply_as='DATA', modifier="Smooth")
+
+        self.blend_obj.name = self.name
+
+    def _displace(self, vertices):
+        '''Push random vertices in or out to make peaks'''
         max_z = max(map(lambda co: co.co[2], vertices))
         min_z = min(map(lambda co: co.co[2], vertices))
         for i in range(len(vertices)):
@@ -94,13 +153,9 @@ class Potato:
             new_co = _to_xyz(Vector((r, theta, phi)))
             vertices[i].co = new_co
 
-        # Smooth it up
-        bpy.ops.object.modifier_add(type='SMOOTH')
-        bpy.context.object.modifiers["Smooth"].factor = self.smooth_factor
-        bpy.context.object.modifiers["Smooth"].iterations = self.smooth_steps
-        bpy.ops.object.modifier_apply(apply_as='DATA', modifier="Smooth")
-
-        self.blend_obj.name = self.name
+    def make_proxy(self, ratio=0.1):
+        '''Low-poly copy of the potato for glyph sampling'''
+        return decimate_obj(self.blend_obj, ratio, self.name + '_proxy')
 
     @property
     def bound_box(self):
@@ -108,3 +163,46 @@ class Potato:
         bbox = self.blend_obj.bound_box
         coords = [v[:] for v in bbox]
         return Vector(coords[0]), Vector(coords[6])
+
+class NoisePotato(Potato):
+    '''A potato shaped by fractal noise on the sphere
+
+    Smooth at any resolution, so it needs little or no smoothing.
+    '''
+    def __init__(self, amplitude=25,
+            octaves=4,
+            frequency=1.5,
+            lacunarity=2.0,
+            gain=0.5,
+            seed=None,
+            smooth_steps=0,
+            **kwargs):
+        super().__init__(smooth_steps=smooth_steps, **kwargs)
+        self.amplitude = amplitude
+        self.octaves = octaves
+        self.frequency = frequency
+        self.lacunarity = lacunarity
+        self.gain = gain
+        self.seed = seed if seed != None else random.randrange(2**31)
+
+    def _displace(self, vertices):
+        '''Displace every vertex along its direction in one pass'''
+        co = numpy.empty(len(vertices) * 3, dtype=numpy.float32)
+        vertices.foreach_get('co', co)
+        co = co.reshape(-1, 3).astype(float)
+
+        r = numpy.linalg.norm(co, axis=1)
+        directions = co / r[:, None]
+        noise = _fbm(directions * self.frequency, self.seed, self.octaves,
+                self.lacunarity, self.gain)
+
+        # Fade the noise out within margin of the poles
+        z = co[:, 2]
+        max_z, min_z = z.max(), z.min()
+        if self.margin > 0:
+            noise *= _smoothstep((max_z - z) / self.margin) * \
+                    _smoothstep((z - min_z) / self.margin)
+
+        co = directions * (r + self.amplitude * noise)[:, None]
+        vertices.foreach_set('co', co.astype(numpy.float32).ravel())
+        self.blend_obj.data.update()
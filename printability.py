@@ -0,0 +1,202 @@
+#  Copyright 2018 Bridger Herman
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Printability checks run on bulk mesh arrays before anything is exported:
+#   - boundary and non-manifold edges, counted with an edge hash
+#   - wall thickness, from inward ray casts against a BVH
+#   - glyphs whose footprint was mostly removed by the boolean difference
+
+import bpy
+import importlib
+import numpy
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from mathutils.kdtree import KDTree
+
+import mesh_helpers
+importlib.reload(mesh_helpers)
+
+class Report:
+    '''Printability summary for one object'''
+    def __init__(self, name):
+        self.name = name
+        self.boundary_edges = 0
+        self.non_manifold_edges = 0
+        self.wire_edges = 0
+        self.thickness_samples = 0
+        self.thin_samples = 0
+        self.min_thickness = None
+        self.glyphs = 0
+        self.removed_glyphs = 0
+        self.problems = []
+
+    @property
+    def passed(self):
+        return len(self.problems) == 0
+
+    def as_dict(self):
+        d = {k: v for k, v in self.__dict__.items()}
+        d['passed'] = self.passed
+        return d
+
+    def __str__(self):
+        status = 'PASS' if self.passed else 'FAIL'
+        lines = ['{}: {}'.format(self.name, status)]
+        lines += ['    ' + p for p in self.problems]
+        return '\n'.join(lines)
+
+def _loop_polygons(arrays):
+    '''Polygon index of every loop, and the loop that follows it'''
+    starts, totals = arrays['loop_start'], arrays['loop_total']
+    poly = numpy.repeat(numpy.arange(len(starts)), totals)
+    position = numpy.arange(len(poly)) - starts[poly]
+    following = starts[poly] + (position + 1) % totals[poly]
+    return poly, following
+
+def _edge_keys(a, b, num_vertices):
+    return numpy.minimum(a, b) * num_vertices + numpy.maximum(a, b)
+
+def edge_counts(arrays):
+    '''Number of boundary, non-manifold and wire (faceless) edges'''
+    loops = arrays['loops']
+    nv = len(arrays['co'])
+    _, following = _loop_polygons(arrays)
+    keys, counts = numpy.unique(_edge_keys(loops, loops[following], nv),
+            return_counts=True)
+    edges = arrays['edges']
+    edge_keys = _edge_keys(edges[:, 0], edges[:, 1], nv)
+    if len(keys) == 0:
+        return 0, 0, len(edge_keys)
+    position = numpy.minimum(numpy.searchsorted(keys, edge_keys), len(keys) - 1)
+    wire = numpy.count_nonzero(keys[position] != edge_keys)
+    return int((counts == 1).sum()), int((counts > 2).sum()), int(wire)
+
+def polygon_areas_centers(arrays):
+    '''Area and centroid of every polygon (Newell's method)'''
+    co, loops = arrays['co'], arrays['loops']
+    poly, following = _loop_polygons(arrays)
+    npoly = len(arrays['loop_start'])
+    cross = numpy.cross(co[loops], co[loops[following]])
+    vector = numpy.zeros((npoly, 3))
+    numpy.add.at(vector, poly, cross)
+    centers = numpy.zeros((npoly, 3))
+    numpy.add.at(centers, poly, co[loops])
+    centers /= numpy.maximum(arrays['loop_total'], 1)[:, None]
+    return numpy.linalg.norm(vector, axis=1) / 2, centers
+
+def glyph_footprints(obj):
+    '''Centroid and surface area of each glyph (mesh island)
+
+    Take this from the joined glyph object before the boolean difference
+    and pass it to analyze afterwards.
+    '''
+    arrays = mesh_helpers.mesh_arrays(obj)
+    labels = mesh_helpers.vertex_islands(arrays)
+    areas, centers = polygon_areas_centers(arrays)
+    poly_islands = labels[arrays['loops'][arrays['loop_start']]]
+    islands, index = numpy.unique(poly_islands, return_inverse=True)
+    island_areas = numpy.bincount(index, weights=areas)
+    island_centers = numpy.zeros((len(islands), 3))
+    numpy.add.at(island_centers, index, centers * areas[:, None])
+    island_centers /= numpy.maximum(island_areas, 1e-12)[:, None]
+    return island_centers, island_areas
+
+def _nearest(points, targets):
+    '''Index of the nearest target for every point'''
+    tree = KDTree(len(targets))
+    for i, co in enumerate(targets.tolist()):
+        tree.insert(co, i)
+    tree.balance()
+    return numpy.array([tree.find(co)[1] for co in points.tolist()],
+            dtype=numpy.int64)
+
+def surviving_fractions(arrays, footprints):
+    '''Fraction of each glyph's original area left after the boolean'''
+    centers, areas = footprints
+    if len(centers) == 0:
+        return numpy.zeros(0)
+    poly_areas, poly_centers = polygon_areas_centers(arrays)
+    owner = _nearest(poly_centers, centers)
+    remaining = numpy.bincount(owner, weights=poly_areas, minlength=len(centers))
+    return remaining / numpy.maximum(areas, 1e-12)
+
+def wall_thickness(obj, arrays, samples=2000, epsilon=1e-4):
+    '''Thickness at up to :samples: vertices, by casting rays inwards'''
+    co, normals = arrays['co'], arrays['normals']
+    if len(co) == 0:
+        return numpy.zeros(0)
+    step = max(1, len(co) // samples)
+    bvh = BVHTree.FromObject(obj, bpy.context.scene)
+    thickness = []
+    for p, n in zip(co[::step], normals[::step]):
+        origin = Vector(p - n * epsilon)
+        hit, _, _, distance = bvh.ray_cast(origin, Vector(-n))
+        if hit is not None:
+            thickness.append(distance + epsilon)
+    return numpy.array(thickness)
+
+def analyze(obj, min_thickness=0.5, samples=2000, footprints=None,
+        min_footprint=0.25):
+    '''Check one object and return its Report
+
+    :min_thickness: (float) thinnest printable wall
+    :samples: (int) number of vertices to measure thickness at
+    :footprints: result of glyph_footprints, if obj holds glyphs
+    :min_footprint: (float) flag glyphs keeping less of their area than this
+    '''
+    report = Report(str(obj.name))
+    arrays = mesh_helpers.mesh_arrays(obj)
+
+    report.boundary_edges, report.non_manifold_edges, report.wire_edges = \
+            edge_counts(arrays)
+    if report.boundary_edges:
+        report.problems.append('{} boundary edges'.format(report.boundary_edges))
+    if report.non_manifold_edges:
+        report.problems.append('{} non-manifold edges'.format(
+                report.non_manifold_edges))
+    if report.wire_edges:
+        report.problems.append('{} wire edges'.format(report.wire_edges))
+
+    thickness = wall_thickness(obj, arrays, samples)
+    report.thickness_samples = len(thickness)
+    if len(thickness):
+        report.min_thickness = float(thickness.min())
+        report.thin_samples = int((thickness < min_thickness).sum())
+    if report.thin_samples:
+        report.problems.append('{} of {} samples thinner than {} (min {:.3f})'
+                .format(report.thin_samples, report.thickness_samples,
+                min_thickness, report.min_thickness))
+
+    if footprints != None:
+        fractions = surviving_fractions(arrays, footprints)
+        report.glyphs = len(fractions)
+        report.removed_glyphs = int((fractions < min_footprint).sum())
+        if report.removed_glyphs:
+            report.problems.append('{} of {} glyphs mostly removed'.format(
+                    report.removed_glyphs, report.glyphs))
+    return report
+
+def print_reports(reports):
+    for report in reports:
+        print(report)
+    failed = sum(1 for r in reports if not r.passed)
+    print('Printability: {} of {} objects passed'.format(
+            len(reports) - failed, len(reports)))
+    return failed == 0
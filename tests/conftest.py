@@ -0,0 +1,70 @@
+import os
+import sys
+import random
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The stand-in bpy/mathutils must shadow any real ones
+sys.path.insert(0, os.path.join(TESTS_DIR, 'standin'))
+sys.path.insert(1, os.path.dirname(TESTS_DIR))
+
+import bpy
+
+from mapper import LinearMapper3D
+from potato import Potato
+
+def pytest_addoption(parser):
+    parser.addoption('--runslow', action='store_true', default=False,
+            help='run tests marked slow (timing-based scaling checks)')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: long-running timing test')
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--runslow'):
+        return
+    skip = pytest.mark.skip(reason='needs --runslow')
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture(autouse=True)
+def empty_scene():
+    '''Every test starts from an empty stand-in scene'''
+    bpy._reset()
+    yield
+
+@pytest.fixture
+def make_potato():
+    '''Factory for a small seeded potato and a mapper along its x axis
+
+    Returns (potato, mapper).
+    '''
+    def make(seed, output_range=(0.5, 3.0), resolution=16):
+        random.seed(seed)
+        p = Potato(resolution=resolution, base_size=15, max_peak_height=3,
+                margin=1, smooth_steps=2)
+        p.generate()
+        minm, maxm = p.bound_box
+        m = LinearMapper3D((minm.x, maxm.x), (minm.y, maxm.y),
+                (minm.z, maxm.z), lambda x, y, z: x,
+                output_range=output_range, step=5, num_bins=8)
+        return p, m
+    return make
+
+@pytest.fixture
+def make_scene(make_potato):
+    '''Factory for a potato with a glyph generator of the given class
+
+    Returns (potato, generator).
+    '''
+    def make(generator, seed, output_range=(0.5, 3.0), cutoff=None,
+            resolution=16, **kwargs):
+        p, m = make_potato(seed, output_range, resolution)
+        g = generator(p.blend_obj, m.map, **kwargs)
+        if cutoff != None:
+            g.cutoff = cutoff
+        return p, g
+    return make
@@ -0,0 +1,749 @@
+# Minimal stand-in for Blender 2.79's bpy, enough to run this project's
+# modules outside Blender. Meshes, objects, selection and the operators
+# the project calls are modelled in plain Python. Modifiers that need a
+# real geometry kernel are approximated:
+#
+#   SMOOTH     Laplacian smoothing, like Blender's
+#   BOOLEAN    no-op (there is no CSG here)
+#   DECIMATE   no-op (the mesh is kept as is)
+#
+# Call _reset() between tests to start from an empty scene.
+
+import math
+import fnmatch
+import itertools
+
+import numpy
+
+from mathutils import Vector, Matrix
+
+# Mesh data
+
+class MeshVertex:
+    def __init__(self, mesh, index, co):
+        self._mesh = mesh
+        self.index = index
+        self._co = Vector(co)
+        self.select = True
+
+    @property
+    def co(self):
+        return self._co
+
+    @co.setter
+    def co(self, value):
+        self._co = Vector(value)
+        self._mesh._dirty()
+
+    @property
+    def normal(self):
+        return Vector(self._mesh._vertex_normals()[self.index])
+
+    @normal.setter
+    def normal(self, value):
+        # Kept until the geometry changes, then recomputed
+        self._mesh._vertex_normals()[self.index] = list(value)
+
+class MeshEdge:
+    def __init__(self, index, vertices):
+        self.index = index
+        self.vertices = tuple(vertices)
+        self.select = True
+
+class MeshLoop:
+    def __init__(self, index, vertex_index):
+        self.index = index
+        self.vertex_index = vertex_index
+
+class MeshPolygon:
+    def __init__(self, mesh, index, vertices, loop_start=0):
+        self._mesh = mesh
+        self.index = index
+        self.vertices = tuple(vertices)
+        self.loop_start = loop_start
+        self.loop_total = len(self.vertices)
+        self.select = True
+
+    @property
+    def normal(self):
+        return Vector(self._mesh._polygon_normals()[self.index])
+
+    @property
+    def center(self):
+        cos = [self._mesh.vertices[i].co for i in self.vertices]
+        return sum(cos, Vector((0, 0, 0))) / len(cos)
+
+    @property
+    def area(self):
+        return float(self._mesh._polygon_areas()[self.index])
+
+class MeshLayerValue:
+    def __init__(self):
+        self.value = 0.0
+
+class MeshLayer:
+    def __init__(self, name, size):
+        self.name = name
+        self.data = [MeshLayerValue() for _ in range(size)]
+
+class MeshLayers:
+    def __init__(self, mesh):
+        self._mesh = mesh
+        self._layers = {}
+
+    def new(self, name=''):
+        layer = MeshLayer(name, len(self._mesh.vertices))
+        self._layers[name] = layer
+        return layer
+
+    def __getitem__(self, name):
+        return self._layers[name]
+
+    def get(self, name, default=None):
+        return self._layers.get(name, default)
+
+    def __iter__(self):
+        return iter(self._layers.values())
+
+    def __len__(self):
+        return len(self._layers)
+
+class MeshCollection:
+    '''Mesh element sequence with foreach_get/foreach_set'''
+    def __init__(self, items=()):
+        self._items = list(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._items[i]
+        return self._items[i]
+
+    def foreach_get(self, attr, seq):
+        flat = [c for item in self._items for c in _flatten(getattr(item, attr))]
+        seq[:] = flat if not isinstance(seq, numpy.ndarray) else \
+                numpy.asarray(flat, dtype=seq.dtype)
+
+    def foreach_set(self, attr, seq):
+        seq = list(seq)
+        if len(self._items) == 0:
+            return
+        width = len(seq) // len(self._items)
+        for i, item in enumerate(self._items):
+            chunk = seq[i * width:(i + 1) * width]
+            setattr(item, attr, chunk if width > 1 else chunk[0])
+
+def _flatten(value):
+    try:
+        return list(value)
+    except TypeError:
+        return [value]
+
+class Mesh:
+    def __init__(self, name='Mesh'):
+        self.name = name
+        self.vertices = MeshCollection()
+        self.edges = MeshCollection()
+        self.polygons = MeshCollection()
+        self.loops = MeshCollection()
+        self.vertex_layers_float = MeshLayers(self)
+        self._cache = {}
+
+    @property
+    def users(self):
+        return sum(1 for ob in data.objects if ob.data is self)
+
+    def _dirty(self):
+        self._cache.clear()
+
+    def update(self, calc_edges=False):
+        self._dirty()
+        if calc_edges:
+            self._set_edges(_edges_of(p.vertices for p in self.polygons))
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices = MeshCollection(
+                MeshVertex(self, i, co) for i, co in enumerate(vertices))
+        faces = [tuple(f) for f in faces]
+        starts = list(itertools.accumulate([0] + [len(f) for f in faces]))
+        self.polygons = MeshCollection(
+                MeshPolygon(self, i, f, starts[i]) for i, f in enumerate(faces))
+        self.loops = MeshCollection(MeshLoop(i, v)
+                for i, v in enumerate(v for f in faces for v in f))
+        edge_keys = _edges_of(faces)
+        seen = set(edge_keys)
+        for e in edges:
+            key = tuple(sorted(e))
+            if key not in seen:
+                seen.add(key)
+                edge_keys.append(key)
+        self._set_edges(edge_keys)
+        self.vertex_layers_float = MeshLayers(self)
+        self._dirty()
+
+    def _set_edges(self, edge_keys):
+        self.edges = MeshCollection(
+                MeshEdge(i, e) for i, e in enumerate(edge_keys))
+
+    def copy(self):
+        m = Mesh(self.name)
+        m.from_pydata([v.co for v in self.vertices],
+                [e.vertices for e in self.edges],
+                [p.vertices for p in self.polygons])
+        for src, dst in ((self.vertices, m.vertices), (self.edges, m.edges),
+                (self.polygons, m.polygons)):
+            for a, b in zip(src, dst):
+                b.select = a.select
+        for layer in self.vertex_layers_float:
+            new = m.vertex_layers_float.new(layer.name)
+            for a, b in zip(layer.data, new.data):
+                b.value = a.value
+        data.meshes._add(m)
+        return m
+
+    def _coords(self):
+        if 'co' not in self._cache:
+            self._cache['co'] = numpy.array(
+                    [tuple(v.co) for v in self.vertices], dtype=float).reshape(-1, 3)
+        return self._cache['co']
+
+    def _polygon_vectors(self):
+        # Newell's method, so n-gons work too
+        if 'pvec' not in self._cache:
+            co = self._coords()
+            result = numpy.zeros((len(self.polygons), 3))
+            for p in self.polygons:
+                pts = co[list(p.vertices)]
+                nxt = numpy.roll(pts, -1, axis=0)
+                result[p.index] = numpy.cross(pts, nxt).sum(axis=0)
+            self._cache['pvec'] = result
+        return self._cache['pvec']
+
+    def _polygon_areas(self):
+        if 'parea' not in self._cache:
+            self._cache['parea'] = \
+                    numpy.linalg.norm(self._polygon_vectors(), axis=1) / 2
+        return self._cache['parea']
+
+    def _polygon_normals(self):
+        if 'pnor' not in self._cache:
+            vec = self._polygon_vectors()
+            lengths = numpy.linalg.norm(vec, axis=1)
+            lengths[lengths == 0] = 1
+            self._cache['pnor'] = vec / lengths[:, None]
+        return self._cache['pnor']
+
+    def _vertex_normals(self):
+        if 'vnor' not in self._cache:
+            co = self._coords()
+            acc = numpy.zeros_like(co)
+            vec = self._polygon_vectors()
+            for p in self.polygons:
+                acc[list(p.vertices)] += vec[p.index]
+            lengths = numpy.linalg.norm(acc, axis=1)
+            # Loose vertices point away from the origin, like Blender
+            loose = lengths == 0
+            acc[loose] = co[loose]
+            lengths[loose] = numpy.linalg.norm(co[loose], axis=1)
+            lengths[lengths == 0] = 1
+            self._cache['vnor'] = acc / lengths[:, None]
+        return self._cache['vnor']
+
+    def _neighbors(self):
+        neighbors = [set() for _ in self.vertices]
+        for e in self.edges:
+            a, b = e.vertices
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+        return neighbors
+
+    def _delete_vertices(self, doomed):
+        '''Delete vertices and the edges/polygons using them'''
+        doomed = set(doomed)
+        keep = [v for v in self.vertices if v.index not in doomed]
+        remap = {v.index: i for i, v in enumerate(keep)}
+        faces = [p for p in self.polygons if not doomed.intersection(p.vertices)]
+        edges = [e for e in self.edges if not doomed.intersection(e.vertices)]
+        layers = [(l.name, [l.data[v.index].value for v in keep])
+                for l in self.vertex_layers_float]
+        selections = ([v.select for v in keep], [e.select for e in edges],
+                [p.select for p in faces])
+        self.from_pydata([v.co for v in keep],
+                [[remap[i] for i in e.vertices] for e in edges],
+                [[remap[i] for i in p.vertices] for p in faces])
+        for name, values in layers:
+            layer = self.vertex_layers_float.new(name)
+            for item, value in zip(layer.data, values):
+                item.value = value
+        for items, selected in zip((self.vertices, self.edges, self.polygons),
+                selections):
+            for item, s in zip(items, selected):
+                item.select = s
+
+def _edges_of(faces):
+    keys, seen = [], set()
+    for f in faces:
+        for a, b in zip(f, f[1:] + f[:1]):
+            key = (a, b) if a < b else (b, a)
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+    return keys
+
+# Objects
+
+def _euler_matrix(euler):
+    x, y, z = euler
+    cx, sx, cy, sy, cz, sz = (math.cos(x), math.sin(x), math.cos(y),
+            math.sin(y), math.cos(z), math.sin(z))
+    rx = numpy.array(((1, 0, 0), (0, cx, -sx), (0, sx, cx)))
+    ry = numpy.array(((cy, 0, sy), (0, 1, 0), (-sy, 0, cy)))
+    rz = numpy.array(((cz, -sz, 0), (sz, cz, 0), (0, 0, 1)))
+    return rz.dot(ry).dot(rx)
+
+def _matrix_euler(r):
+    # Inverse of _euler_matrix (XYZ order)
+    sy = math.sqrt(r[0, 0] ** 2 + r[1, 0] ** 2)
+    if sy > 1e-9:
+        return (math.atan2(r[2, 1], r[2, 2]), math.atan2(-r[2, 0], sy),
+                math.atan2(r[1, 0], r[0, 0]))
+    return (math.atan2(-r[1, 2], r[1, 1]), math.atan2(-r[2, 0], sy), 0.0)
+
+class Modifier:
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        self.object = None
+        self.operation = 'DIFFERENCE'
+        self.solver = 'BMESH'
+        self.factor = 0.5
+        self.iterations = 1
+        self.ratio = 1.0
+
+class Modifiers:
+    def __init__(self):
+        self._mods = []
+
+    def new(self, name, type):
+        mod = Modifier(name, type)
+        self._mods.append(mod)
+        return mod
+
+    def remove(self, mod):
+        self._mods.remove(mod)
+
+    def __getitem__(self, name):
+        for mod in self._mods:
+            if mod.name == name:
+                return mod
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(self._mods)
+
+    def __len__(self):
+        return len(self._mods)
+
+class Object:
+    def __init__(self, name, object_data):
+        self._name = None
+        self.data = object_data
+        self.location = Vector((0, 0, 0))
+        self.rotation_euler = Vector((0, 0, 0))
+        self.scale = Vector((1, 1, 1))
+        self.rotation_mode = 'XYZ'
+        self.select = False
+        self.hide = False
+        self.mode = 'OBJECT'
+        self.parent = None
+        self.dupli_type = 'NONE'
+        self.use_dupli_vertices_rotation = False
+        self.modifiers = Modifiers()
+        self.type = 'MESH'
+        self.name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        data.objects._rename(self, value)
+
+    @property
+    def matrix_world(self):
+        m = numpy.identity(4)
+        m[:3, :3] = _euler_matrix(self.rotation_euler) * numpy.array(list(self.scale))
+        m[:3, 3] = list(self.location)
+        result = Matrix(m)
+        if self.parent is not None:
+            result = self.parent.matrix_world * result
+        return result
+
+    @matrix_world.setter
+    def matrix_world(self, value):
+        m = numpy.array([list(r) for r in value], dtype=float)
+        if self.parent is not None:
+            m = numpy.linalg.inv(numpy.array(
+                    [list(r) for r in self.parent.matrix_world])).dot(m)
+        basis = m[:3, :3]
+        scale = numpy.linalg.norm(basis, axis=0)
+        rotation = basis / numpy.where(scale == 0, 1, scale)
+        if numpy.linalg.det(rotation) < 0:
+            scale[0] = -scale[0]
+            rotation[:, 0] = -rotation[:, 0]
+        self.location = Vector(m[:3, 3])
+        self.scale = Vector(scale)
+        self.rotation_euler = Vector(_matrix_euler(rotation))
+
+    @property
+    def bound_box(self):
+        co = self.data._coords() if len(self.data.vertices) else numpy.zeros((1, 3))
+        lo, hi = co.min(axis=0), co.max(axis=0)
+        corners = []
+        for x, y, z in ((0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0),
+                (1, 0, 0), (1, 0, 1), (1, 1, 1), (1, 1, 0)):
+            corners.append(Vector((hi[0] if x else lo[0], hi[1] if y else lo[1],
+                    hi[2] if z else lo[2])))
+        return corners
+
+    def _apply_transform(self):
+        m = self.matrix_world
+        for v in self.data.vertices:
+            v.co = m * v.co
+        self.location = Vector((0, 0, 0))
+        self.rotation_euler = Vector((0, 0, 0))
+        self.scale = Vector((1, 1, 1))
+
+# Collections
+
+class ObjectData:
+    def __init__(self):
+        self._objects = {}
+
+    def _unique(self, name):
+        if name not in self._objects:
+            return name
+        base, _, suffix = name.rpartition('.')
+        if not (base and suffix.isdigit()):
+            base = name
+        for i in itertools.count(1):
+            candidate = '{}.{:03d}'.format(base, i)
+            if candidate not in self._objects:
+                return candidate
+
+    def _rename(self, ob, name):
+        if ob._name == name:
+            return
+        if ob._name is not None:
+            del self._objects[ob._name]
+        ob._name = self._unique(name)
+        self._objects[ob._name] = ob
+
+    def new(self, name, object_data):
+        return Object(name, object_data)
+
+    def remove(self, ob, do_unlink=True):
+        self._objects.pop(ob.name, None)
+        context.scene.objects._unlink(ob)
+
+    def __getitem__(self, name):
+        return self._objects[name]
+
+    def get(self, name, default=None):
+        return self._objects.get(name, default)
+
+    def __contains__(self, name):
+        return name in self._objects
+
+    def __iter__(self):
+        return iter(list(self._objects.values()))
+
+    def __len__(self):
+        return len(self._objects)
+
+class MeshData:
+    def __init__(self):
+        self._meshes = []
+
+    def _add(self, mesh):
+        self._meshes.append(mesh)
+
+    def new(self, name):
+        mesh = Mesh(name)
+        self._add(mesh)
+        return mesh
+
+    def remove(self, mesh, do_unlink=True):
+        self._meshes.remove(mesh)
+
+    def __iter__(self):
+        return iter(list(self._meshes))
+
+    def __len__(self):
+        return len(self._meshes)
+
+class SceneObjects:
+    def __init__(self):
+        self._objects = []
+        self.active = None
+
+    def link(self, ob):
+        if ob not in self._objects:
+            self._objects.append(ob)
+
+    def unlink(self, ob):
+        self._unlink(ob)
+
+    def _unlink(self, ob):
+        if ob in self._objects:
+            self._objects.remove(ob)
+        if self.active is ob:
+            self.active = None
+
+    def __iter__(self):
+        return iter(list(self._objects))
+
+    def __len__(self):
+        return len(self._objects)
+
+class Scene:
+    def __init__(self):
+        self.objects = SceneObjects()
+
+class Context:
+    def __init__(self):
+        self.scene = Scene()
+
+    @property
+    def active_object(self):
+        return self.scene.objects.active
+
+    @property
+    def object(self):
+        return self.scene.objects.active
+
+    @property
+    def selected_objects(self):
+        return [ob for ob in self.scene.objects if ob.select]
+
+class Data:
+    def __init__(self):
+        self.objects = ObjectData()
+        self.meshes = MeshData()
+
+data = Data()
+context = Context()
+
+def _reset():
+    global data, context
+    data = Data()
+    context = Context()
+
+# Operators
+
+def _add_object(name, mesh, location):
+    for ob in context.scene.objects:
+        ob.select = False
+    ob = Object(name, mesh)
+    ob.location = Vector(location)
+    ob.select = True
+    context.scene.objects.link(ob)
+    context.scene.objects.active = ob
+    return ob
+
+def _new_mesh(name, vertices, faces):
+    mesh = data.meshes.new(name)
+    mesh.from_pydata(vertices, [], faces)
+    return mesh
+
+class _MeshOps:
+    @staticmethod
+    def primitive_uv_sphere_add(segments=32, ring_count=16, size=1.0,
+            location=(0, 0, 0), **kwargs):
+        vertices = [(0, 0, size)]
+        for ring in range(1, ring_count):
+            phi = math.pi * ring / ring_count
+            for seg in range(segments):
+                theta = 2 * math.pi * seg / segments
+                vertices.append((size * math.sin(phi) * math.cos(theta),
+                        size * math.sin(phi) * math.sin(theta),
+                        size * math.cos(phi)))
+        vertices.append((0, 0, -size))
+        bottom = len(vertices) - 1
+        ring_start = lambda ring: 1 + (ring - 1) * segments
+        faces = []
+        for seg in range(segments):
+            nxt = (seg + 1) % segments
+            faces.append((0, ring_start(1) + seg, ring_start(1) + nxt))
+            for ring in range(1, ring_count - 1):
+                a, b = ring_start(ring), ring_start(ring + 1)
+                faces.append((a + seg, b + seg, b + nxt, a + nxt))
+            last = ring_start(ring_count - 1)
+            faces.append((last + seg, bottom, last + nxt))
+        _add_object('Sphere', _new_mesh('Sphere', vertices, faces), location)
+        return {'FINISHED'}
+
+    @staticmethod
+    def primitive_cube_add(radius=1.0, location=(0, 0, 0), **kwargs):
+        r = radius
+        vertices = [(x, y, z) for x in (-r, r) for y in (-r, r) for z in (-r, r)]
+        faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1),
+                (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+        _add_object('Cube', _new_mesh('Cube', vertices, faces), location)
+        return {'FINISHED'}
+
+    @staticmethod
+    def primitive_plane_add(radius=1.0, location=(0, 0, 0), **kwargs):
+        r = radius
+        vertices = [(-r, -r, 0), (r, -r, 0), (r, r, 0), (-r, r, 0)]
+        _add_object('Plane', _new_mesh('Plane', vertices, [(0, 1, 2, 3)]),
+                location)
+        return {'FINISHED'}
+
+    @staticmethod
+    def delete(type='VERT'):
+        ob = context.active_object
+        doomed = [v.index for v in ob.data.vertices if v.select]
+        ob.data._delete_vertices(doomed)
+        return {'FINISHED'}
+
+def _smooth(mesh, factor, iterations):
+    # Like Blender's smooth modifier, move towards the mean of the
+    # midpoints of the connected edges
+    neighbors = mesh._neighbors()
+    co = mesh._coords().copy()
+    for _ in range(iterations):
+        new = co.copy()
+        for i, ns in enumerate(neighbors):
+            if ns:
+                midpoint = (co[list(ns)].mean(axis=0) + co[i]) / 2
+                new[i] = co[i] + factor * (midpoint - co[i])
+        co = new
+    for v, c in zip(mesh.vertices, co):
+        v.co = c
+
+class _ObjectOps:
+    @staticmethod
+    def select_all(action='TOGGLE'):
+        obs = list(context.scene.objects)
+        if action == 'TOGGLE':
+            action = 'DESELECT' if any(ob.select for ob in obs) else 'SELECT'
+        for ob in obs:
+            ob.select = action == 'SELECT'
+        return {'FINISHED'}
+
+    @staticmethod
+    def select_pattern(pattern='*', case_sensitive=False, extend=True):
+        for ob in context.scene.objects:
+            name, pat = (ob.name, pattern) if case_sensitive else \
+                    (ob.name.lower(), pattern.lower())
+            if fnmatch.fnmatchcase(name, pat):
+                ob.select = True
+            elif not extend:
+                ob.select = False
+        return {'FINISHED'}
+
+    @staticmethod
+    def modifier_add(type):
+        ob = context.active_object
+        name = type.capitalize()
+        ob.modifiers.new(name, type)
+        return {'FINISHED'}
+
+    @staticmethod
+    def modifier_apply(apply_as='DATA', modifier=''):
+        ob = context.active_object
+        mod = ob.modifiers[modifier]
+        if mod.type == 'SMOOTH':
+            _smooth(ob.data, mod.factor, mod.iterations)
+        ob.modifiers.remove(mod)
+        return {'FINISHED'}
+
+    @staticmethod
+    def convert(target='MESH'):
+        return {'FINISHED'}
+
+    @staticmethod
+    def join():
+        active = context.active_object
+        others = [ob for ob in context.selected_objects if ob is not active]
+        to_local = active.matrix_world.inverted()
+        vertices = [v.co for v in active.data.vertices]
+        edges = [e.vertices for e in active.data.edges]
+        faces = [p.vertices for p in active.data.polygons]
+        for ob in others:
+            offset = len(vertices)
+            m = to_local * ob.matrix_world
+            vertices += [m * v.co for v in ob.data.vertices]
+            edges += [[i + offset for i in e.vertices] for e in ob.data.edges]
+            faces += [[i + offset for i in p.vertices] for p in ob.data.polygons]
+            data.objects.remove(ob)
+        active.data.from_pydata(vertices, edges, faces)
+        return {'FINISHED'}
+
+    @staticmethod
+    def transform_apply(location=False, rotation=False, scale=False):
+        for ob in context.selected_objects:
+            ob._apply_transform()
+        return {'FINISHED'}
+
+    @staticmethod
+    def duplicate(linked=False):
+        selected = context.selected_objects
+        copies = []
+        for ob in selected:
+            copy = Object(ob.name, ob.data.copy())
+            copy.location = Vector(ob.location)
+            copy.rotation_euler = Vector(ob.rotation_euler)
+            copy.scale = Vector(ob.scale)
+            context.scene.objects.link(copy)
+            ob.select = False
+            copy.select = True
+            copies.append(copy)
+            if context.scene.objects.active is ob:
+                context.scene.objects.active = copy
+        return {'FINISHED'}
+
+    @staticmethod
+    def delete(use_global=False):
+        for ob in context.selected_objects:
+            data.objects.remove(ob)
+        return {'FINISHED'}
+
+    @staticmethod
+    def mode_set(mode='OBJECT'):
+        if context.active_object is not None:
+            context.active_object.mode = mode
+        return {'FINISHED'}
+
+class _ExportMeshOps:
+    @staticmethod
+    def stl(filepath='', use_selection=True, **kwargs):
+        obs = context.selected_objects if use_selection else \
+                list(context.scene.objects)
+        with open(filepath, 'w') as f:
+            f.write('solid standin\n')
+            for ob in obs:
+                m = ob.matrix_world
+                for p in ob.data.polygons:
+                    cos = [m * ob.data.vertices[i].co for i in p.vertices]
+                    for i in range(1, len(cos) - 1):
+                        f.write('facet normal 0 0 0\nouter loop\n')
+                        for co in (cos[0], cos[i], cos[i + 1]):
+                            f.write('vertex {} {} {}\n'.format(*co))
+                        f.write('endloop\nendfacet\n')
+            f.write('endsolid standin\n')
+        return {'FINISHED'}
+
+class _Ops:
+    mesh = _MeshOps
+    object = _ObjectOps
+    export_mesh = _ExportMeshOps
+
+ops = _Ops
@@ -0,0 +1,203 @@
+# Minimal stand-in for Blender's mathutils, enough to run this project's
+# modules outside Blender. Only the parts the project uses are provided.
+
+import math
+import numbers
+
+import numpy
+
+class Vector:
+    '''Mutable float vector'''
+    def __init__(self, seq=(0, 0, 0)):
+        self._v = [float(c) for c in seq]
+
+    # Sequence protocol
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(self._v)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self._v[i])
+        return self._v[i]
+
+    def __setitem__(self, i, value):
+        self._v[i] = float(value)
+
+    def __repr__(self):
+        return 'Vector(({}))'.format(', '.join('{:.4f}'.format(c) for c in self))
+
+    def _axis(i):
+        def get(self):
+            return self._v[i]
+        def set(self, value):
+            self._v[i] = float(value)
+        return property(get, set)
+    x, y, z, w = _axis(0), _axis(1), _axis(2), _axis(3)
+    del _axis
+
+    # Arithmetic
+    def __eq__(self, other):
+        try:
+            return len(other) == len(self) and \
+                    all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return False
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self, other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self, other))
+
+    def __rsub__(self, other):
+        return Vector(b - a for a, b in zip(self, other))
+
+    def __neg__(self):
+        return Vector(-a for a in self)
+
+    def __mul__(self, other):
+        if isinstance(other, numbers.Number):
+            return Vector(a * other for a in self)
+        # mathutils: Vector * Vector is the dot product
+        return self.dot(other)
+
+    def __rmul__(self, other):
+        return Vector(a * other for a in self)
+
+    def __truediv__(self, other):
+        return Vector(a / other for a in self)
+
+    def __iadd__(self, other):
+        self._v = [a + b for a, b in zip(self, other)]
+        return self
+
+    def __isub__(self, other):
+        self._v = [a - b for a, b in zip(self, other)]
+        return self
+
+    def __imul__(self, other):
+        self._v = [a * other for a in self]
+        return self
+
+    def __itruediv__(self, other):
+        self._v = [a / other for a in self]
+        return self
+
+    # Geometry
+    @property
+    def length(self):
+        return math.sqrt(sum(a * a for a in self))
+
+    @property
+    def length_squared(self):
+        return sum(a * a for a in self)
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self, other))
+
+    def cross(self, other):
+        ax, ay, az = self
+        bx, by, bz = other
+        return Vector((ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx))
+
+    def normalized(self):
+        length = self.length
+        if length == 0:
+            return Vector(self)
+        return self / length
+
+    def normalize(self):
+        self._v = list(self.normalized())
+
+    def angle(self, other, fallback=None):
+        denom = self.length * Vector(other).length
+        if denom == 0:
+            if fallback is None:
+                raise ValueError('angle() with zero length vector')
+            return fallback
+        return math.acos(max(-1.0, min(1.0, self.dot(other) / denom)))
+
+    def copy(self):
+        return Vector(self)
+
+    def to_tuple(self):
+        return tuple(self)
+
+class Matrix:
+    '''Square float matrix, stored row major'''
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = numpy.identity(4)
+        self._m = numpy.array([list(r) for r in rows], dtype=float)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls(numpy.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        m = numpy.identity(4)
+        m[:3, 3] = list(vector)[:3]
+        return cls(m)
+
+    def __len__(self):
+        return len(self._m)
+
+    def __getitem__(self, i):
+        return Vector(self._m[i])
+
+    def __setitem__(self, i, row):
+        self._m[i] = list(row)
+
+    def __iter__(self):
+        return (Vector(r) for r in self._m)
+
+    def __repr__(self):
+        return 'Matrix({})'.format(self._m.tolist())
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and numpy.array_equal(self._m, other._m)
+
+    __hash__ = None
+
+    def __mul__(self, other):
+        # Blender 2.79 uses * for matrix multiplication
+        if isinstance(other, Matrix):
+            return Matrix(self._m.dot(other._m))
+        if isinstance(other, numbers.Number):
+            return Matrix(self._m * other)
+        v = list(other)
+        n = len(self._m)
+        if len(v) == n - 1:
+            # Transform a point (homogeneous w = 1)
+            return Vector(self._m.dot(v + [1.0])[:n - 1])
+        return Vector(self._m.dot(v))
+
+    __matmul__ = __mul__
+
+    def inverted(self):
+        return Matrix(numpy.linalg.inv(self._m))
+
+    def transposed(self):
+        return Matrix(self._m.T)
+
+    def to_3x3(self):
+        return Matrix(self._m[:3, :3])
+
+    def copy(self):
+        return Matrix(self._m)
+
+    @property
+    def translation(self):
+        return Vector(self._m[:3, 3])
+
+    @translation.setter
+    def translation(self, value):
+        self._m[:3, 3] = list(value)
@@ -0,0 +1,123 @@
+# Brute-force stand-in for mathutils.bvhtree.BVHTree. Queries are
+# vectorized over all triangles, which is plenty for test-sized meshes.
+
+import numpy
+
+from mathutils import Vector
+
+class BVHTree:
+    def __init__(self, vertices, triangles, tri_polygons):
+        self._tris = numpy.asarray(vertices, dtype=float)[
+                numpy.asarray(triangles, dtype=int).reshape(-1, 3)]
+        self._polygons = numpy.asarray(tri_polygons, dtype=int)
+        e1 = self._tris[:, 1] - self._tris[:, 0]
+        e2 = self._tris[:, 2] - self._tris[:, 0]
+        normals = numpy.cross(e1, e2)
+        lengths = numpy.linalg.norm(normals, axis=1)
+        lengths[lengths == 0] = 1
+        self._normals = normals / lengths[:, None]
+
+    @classmethod
+    def FromObject(cls, obj, scene, deform=True, render=False, cage=False,
+            epsilon=0.0):
+        '''Tree of an object's mesh, in object space'''
+        mesh = obj.data
+        vertices = [tuple(v.co) for v in mesh.vertices]
+        triangles, tri_polygons = [], []
+        for p in mesh.polygons:
+            vs = p.vertices
+            for i in range(1, len(vs) - 1):
+                triangles.append((vs[0], vs[i], vs[i + 1]))
+                tri_polygons.append(p.index)
+        return cls(vertices, triangles, tri_polygons)
+
+    @classmethod
+    def FromPolygons(cls, vertices, polygons, all_triangles=False, epsilon=0.0):
+        triangles, tri_polygons = [], []
+        for index, vs in enumerate(polygons):
+            for i in range(1, len(vs) - 1):
+                triangles.append((vs[0], vs[i], vs[i + 1]))
+                tri_polygons.append(index)
+        return cls([tuple(v) for v in vertices], triangles, tri_polygons)
+
+    def _closest_points(self, p):
+        # Closest point on each triangle (Ericson, Real-Time Collision
+        # Detection 5.1.5), vectorized over triangles
+        a, b, c = self._tris[:, 0], self._tris[:, 1], self._tris[:, 2]
+        ab, ac, ap = b - a, c - a, p - a
+        d1 = (ab * ap).sum(1)
+        d2 = (ac * ap).sum(1)
+        bp = p - b
+        d3 = (ab * bp).sum(1)
+        d4 = (ac * bp).sum(1)
+        cp = p - c
+        d5 = (ab * cp).sum(1)
+        d6 = (ac * cp).sum(1)
+
+        vc = d1 * d4 - d3 * d2
+        vb = d5 * d2 - d1 * d6
+        va = d3 * d6 - d5 * d4
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            denom = 1.0 / (va + vb + vc)
+            v = vb * denom
+            w = vc * denom
+            result = a + ab * v[:, None] + ac * w[:, None]
+
+            t_ab = d1 / (d1 - d3)
+            on_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+            result[on_ab] = (a + ab * t_ab[:, None])[on_ab]
+
+            t_ac = d2 / (d2 - d6)
+            on_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+            result[on_ac] = (a + ac * t_ac[:, None])[on_ac]
+
+            t_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+            on_bc = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+            result[on_bc] = (b + (c - b) * t_bc[:, None])[on_bc]
+
+        in_a = (d1 <= 0) & (d2 <= 0)
+        result[in_a] = a[in_a]
+        in_b = (d3 >= 0) & (d4 <= d3)
+        result[in_b] = b[in_b]
+        in_c = (d6 >= 0) & (d5 <= d6)
+        result[in_c] = c[in_c]
+        return result
+
+    def find_nearest(self, origin, distance=1.84467e19):
+        if len(self._tris) == 0:
+            return None, None, None, None
+        p = numpy.array(list(origin), dtype=float)
+        closest = self._closest_points(p)
+        dists = numpy.linalg.norm(closest - p, axis=1)
+        i = int(numpy.argmin(dists))
+        if dists[i] > distance:
+            return None, None, None, None
+        return Vector(closest[i]), Vector(self._normals[i]), \
+                int(self._polygons[i]), float(dists[i])
+
+    def ray_cast(self, origin, direction, distance=1.84467e19):
+        if len(self._tris) == 0:
+            return None, None, None, None
+        o = numpy.array(list(origin), dtype=float)
+        d = numpy.array(list(direction), dtype=float)
+        d /= numpy.linalg.norm(d)
+        # Moller-Trumbore, vectorized over triangles
+        e1 = self._tris[:, 1] - self._tris[:, 0]
+        e2 = self._tris[:, 2] - self._tris[:, 0]
+        h = numpy.cross(d, e2)
+        det = (e1 * h).sum(1)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            inv = 1.0 / det
+            s = o - self._tris[:, 0]
+            u = (s * h).sum(1) * inv
+            q = numpy.cross(s, e1)
+            v = (q * d).sum(1) * inv
+            t = (q * e2).sum(1) * inv
+            hit = (numpy.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & \
+                    (u + v <= 1) & (t > 0) & (t <= distance)
+        if not hit.any():
+            return None, None, None, None
+        candidates = numpy.where(hit)[0]
+        i = int(candidates[numpy.argmin(t[candidates])])
+        return Vector(o + d * t[i]), Vector(self._normals[i]), \
+                int(self._polygons[i]), float(t[i])
@@ -0,0 +1,29 @@
+# Brute-force stand-in for mathutils.kdtree.KDTree, vectorized over the
+# inserted points.
+
+import numpy
+
+from mathutils import Vector
+
+class KDTree:
+    def __init__(self, size):
+        self._co = numpy.zeros((size, 3))
+        self._index = numpy.zeros(size, dtype=int)
+        self._count = 0
+
+    def insert(self, co, index):
+        self._co[self._count] = tuple(co)
+        self._index[self._count] = index
+        self._count += 1
+
+    def balance(self):
+        self._co = self._co[:self._count]
+        self._index = self._index[:self._count]
+
+    def find(self, co):
+        if self._count == 0:
+            return None, None, None
+        p = numpy.array(list(co), dtype=float)
+        dists = numpy.linalg.norm(self._co - p, axis=1)
+        i = int(numpy.argmin(dists))
+        return Vector(self._co[i]), int(self._index[i]), float(dists[i])
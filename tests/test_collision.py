@@ -0,0 +1,119 @@
+# Oriented box collision and the packing it produces
+
+import math
+
+import numpy
+
+import blender_utils
+import collision
+from glyph_cube import HeightCubeGenerator, LengthCubeGenerator, \
+        SharedCubeGenerator, SizeCubeGenerator
+
+def rotation_z(angle):
+    c, s = math.cos(angle), math.sin(angle)
+    return numpy.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+def brute_force_overlaps(boxes):
+    '''Pairs of boxes sharing a point, found by sampling box interiors'''
+    pairs = set()
+    grid = numpy.linspace(-1, 1, 9)
+    local = numpy.array([(x, y, z) for x in grid for y in grid for z in grid])
+    for i, (ci, ai, ei) in enumerate(boxes):
+        inside = ci + (local * ei).dot(ai.T)
+        for j, (cj, aj, ej) in enumerate(boxes):
+            if i == j:
+                continue
+            rel = (inside - cj).dot(aj)
+            if (numpy.abs(rel) <= ej + 1e-9).all(axis=1).any():
+                pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+def test_sat_rotated_boxes():
+    extents = numpy.array([2.0, 0.25, 0.25])
+    axes = rotation_z(math.pi / 4)
+    # Two thin bars at 45 degrees, side by side: the axis-aligned bounds
+    # overlap but the bars don't
+    center = numpy.zeros(3)
+    beside = numpy.array([[0.5, -0.5, 0.0]])
+    assert not collision.obb_overlaps(center, axes, extents, beside,
+            axes[None], extents[None])[0]
+    along = numpy.array([[1.0, 1.0, 0.0]])
+    assert collision.obb_overlaps(center, axes, extents, along,
+            axes[None], extents[None])[0]
+    # Crossing bars overlap
+    crossed = rotation_z(-math.pi / 4)
+    assert collision.obb_overlaps(center, axes, extents, center[None],
+            crossed[None], extents[None])[0]
+
+def test_index_matches_brute_force():
+    rng = numpy.random.RandomState(3)
+    boxes = []
+    index = collision.BoxIndex(cell_size=2.0)
+    found = set()
+    for _ in range(60):
+        q, _ = numpy.linalg.qr(rng.normal(size=(3, 3)))
+        box = (rng.uniform(-6, 6, 3), q, rng.uniform(0.2, 1.5, 3))
+        for j in index.overlapping(*box):
+            found.add((int(j), len(boxes)))
+        index.insert(*box)
+        boxes.append(box)
+    expected = brute_force_overlaps(boxes)
+    # Sampling can miss shallow overlaps but never invents one
+    assert expected <= found
+    assert len(found) > 0
+
+def test_vertex_gradients_match_per_vertex(make_scene):
+    p, _ = make_scene(LengthCubeGenerator, 2, cutoff=5)
+    mesh = p.blend_obj.data
+    gradients = blender_utils.vertex_gradients(mesh.vertices, mesh.edges)
+    for i in range(len(mesh.vertices)):
+        expected = blender_utils.gradient_at_vertex_2(mesh.edges,
+                mesh.vertices, i)
+        assert numpy.allclose(gradients[i], tuple(expected), atol=1e-9)
+
+def test_sampling_computes_gradients_once(make_scene, monkeypatch):
+    calls = {'all': 0, 'single': 0}
+    vertex_gradients = blender_utils.vertex_gradients
+
+    def count_all(*args):
+        calls['all'] += 1
+        return vertex_gradients(*args)
+
+    def count_single(*args):
+        calls['single'] += 1
+
+    monkeypatch.setattr(blender_utils, 'vertex_gradients', count_all)
+    monkeypatch.setattr(blender_utils, 'gradient_at_vertex_2', count_single)
+    _, g = make_scene(LengthCubeGenerator, 2, cutoff=5)
+    assert len(g.distribute_poisson()) > 0
+    assert calls == {'all': 1, 'single': 0}
+
+def assert_no_overlaps(boxes):
+    for i, box in enumerate(boxes):
+        others = boxes[:i] + boxes[i + 1:]
+        hit = collision.obb_overlaps(box[0], box[1], box[2],
+                numpy.array([b[0] for b in others]),
+                numpy.array([b[1] for b in others]),
+                numpy.array([b[2] for b in others]))
+        assert not hit.any()
+
+def test_sampled_glyphs_do_not_overlap(make_scene):
+    _, g = make_scene(LengthCubeGenerator, 2, cutoff=5)
+    points = g.distribute_poisson()
+    assert len(points) > 1
+    assert_no_overlaps([g._glyph_box(point, points[point])
+            for point in points])
+
+def test_shared_set_fits_every_encoding(make_potato):
+    p, m = make_potato(2)
+    # Large glyphs where the other encoding's are small
+    g = SharedCubeGenerator(p.blend_obj, [(HeightCubeGenerator, m.map),
+            (SizeCubeGenerator, lambda *args: 3.5 - m.map(*args))])
+    g.cutoff = 5
+    points = g.distribute_poisson()
+    assert len(points) > 1
+    assert len(g.blend_objs) == 2
+    for encoding in g.generators:
+        glyphs = g._remap(encoding, points)
+        assert_no_overlaps([encoding._glyph_box(point, glyphs[point])
+                for point in glyphs])
@@ -0,0 +1,144 @@
+# File-based job queue, its asyncio client and worker field parsing
+
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+import job_queue
+import worker
+
+def test_claim_in_submission_order(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path))
+    ids = [queue.submit({'n': i}) for i in range(5)]
+    claimed = [queue.claim() for _ in range(5)]
+    assert [job['id'] for job in claimed] == ids
+    assert [job['n'] for job in claimed] == list(range(5))
+    assert queue.claim() == None
+
+def test_finish_and_result(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path))
+    job_id = queue.submit({'n': 1})
+    assert queue.result(job_id) == None
+    queue.claim()
+    queue.finish(job_id, {'status': 'ok'})
+    assert queue.result(job_id) == {'status': 'ok', 'id': job_id}
+    assert os.listdir(os.path.join(str(tmp_path), 'running')) == []
+
+def test_jobs_are_claimed_once(tmp_path):
+    path = str(tmp_path)
+    ids = [job_queue.JobQueue(path).submit({'n': i}) for i in range(200)]
+    claimed = []
+    lock = threading.Lock()
+
+    def claim_all():
+        # Each thread has its own queue object, as separate workers would
+        queue = job_queue.JobQueue(path)
+        while True:
+            job = queue.claim()
+            if job == None:
+                return
+            with lock:
+                claimed.append(job['id'])
+
+    threads = [threading.Thread(target=claim_all) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(ids)
+
+def make_stale(queue, job_id, age=1000):
+    path = os.path.join(queue.path, 'running', job_id + '.json')
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+def test_stale_jobs_are_requeued(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path))
+    first = queue.submit({'n': 0})
+    second = queue.submit({'n': 1})
+    assert queue.claim()['id'] == first
+    # A live worker's job is left alone
+    assert queue.requeue_stale(stale_after=60) == []
+    make_stale(queue, first)
+    # The abandoned job keeps its place ahead of later submissions
+    job = queue.claim(stale_after=60)
+    assert job['id'] == first
+    assert job['attempts'] == 1
+    assert queue.claim(stale_after=60)['id'] == second
+
+def test_crashing_jobs_give_up(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path))
+    job_id = queue.submit({'n': 0})
+    for _ in range(job_queue.MAX_ATTEMPTS):
+        assert queue.claim(stale_after=60)['id'] == job_id
+        make_stale(queue, job_id)
+    assert queue.claim(stale_after=60) == None
+    assert queue.result(job_id)['status'] == 'error'
+
+def test_heartbeat_keeps_job_fresh(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path))
+    job_id = queue.submit({'n': 0})
+    queue.claim()
+    make_stale(queue, job_id)
+    with queue.keep_alive(job_id, interval=0.01):
+        time.sleep(0.1)
+    assert queue.requeue_stale(stale_after=60) == []
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def test_client_runs_jobs(tmp_path):
+    path = str(tmp_path)
+    stop = threading.Event()
+
+    def serve():
+        queue = job_queue.JobQueue(path)
+        while not stop.is_set():
+            job = queue.claim()
+            if job == None:
+                time.sleep(0.01)
+                continue
+            queue.finish(job['id'], {'double': 2 * job['n']})
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    try:
+        client = job_queue.JobClient(path, poll_interval=0.01)
+        results = run(client.run_all([{'n': i} for i in range(5)], timeout=10))
+    finally:
+        stop.set()
+        thread.join()
+    assert [r['double'] for r in results] == [0, 2, 4, 6, 8]
+
+def test_client_times_out(tmp_path):
+    client = job_queue.JobClient(str(tmp_path), poll_interval=0.01)
+    with pytest.raises(asyncio.TimeoutError):
+        run(client.run({'n': 0}, timeout=0.05))
+
+def test_field_expressions():
+    f = worker.field_fn('math.sin(x) * y + z ** 2 - 1.5')
+    assert abs(f(0.5, 2, 3) - (2 * 0.479425538604203 + 9 - 1.5)) < 1e-9
+    assert worker.field_fn('x')(4, 5, 6) == 4
+
+@pytest.mark.parametrize('expression', [
+    '__import__("os")',
+    'math.__class__',
+    '().__class__.__bases__[0]',
+    'open("/etc/passwd")',
+    'x if y else z',
+    '[x for x in y]',
+    '"text"',
+    'lambda: 0',
+    'x, y',
+    'x)(',
+])
+def test_unsafe_field_expressions(expression):
+    with pytest.raises(ValueError):
+        worker.field_fn(expression)
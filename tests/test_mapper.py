@@ -0,0 +1,63 @@
+import random
+
+import bpy
+
+from mapper import LinearMapper3D, QuantileMapper3D
+
+def make_sphere():
+    bpy.ops.mesh.primitive_uv_sphere_add(size=10, segments=32, ring_count=16)
+    return bpy.context.active_object
+
+# Strongly skewed towards small values
+skewed = lambda x, y, z: ((x + 10) / 20)**8
+
+def bin_shares(mapper, obj):
+    counts = {}
+    for v in obj.data.vertices:
+        value = mapper.map(*v.co)
+        counts[value] = counts.get(value, 0) + 1
+    total = len(obj.data.vertices)
+    return {k: c / total for k, c in counts.items()}
+
+def test_quantile_bins_are_balanced():
+    obj = make_sphere()
+    m = QuantileMapper3D(obj, skewed, output_range=(1, 8), num_bins=8, seed=1)
+    shares = bin_shares(m, obj)
+    assert sorted(shares) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert max(shares.values()) < 0.25
+
+    # The linear mapping crowds the same field into a few bins
+    minm, maxm = obj.bound_box[0], obj.bound_box[6]
+    linear = LinearMapper3D((minm.x, maxm.x), (minm.y, maxm.y),
+            (minm.z, maxm.z), skewed, output_range=(1, 8), step=2, num_bins=8)
+    assert max(bin_shares(linear, obj).values()) > 0.5
+
+def test_quantile_map_is_monotonic_and_in_range():
+    obj = make_sphere()
+    m = QuantileMapper3D(obj, lambda x, y, z: z, output_range=(0.5, 3.0),
+            num_bins=8, samples=1000, seed=2)
+    outputs = [m.map(0, 0, z) for z in range(-12, 13)]
+    assert outputs == sorted(outputs)
+    assert outputs[0] == 0.5 and outputs[-1] == 3.0
+    # Extra arguments (polygon vertices) are ignored, like LinearMapper3D
+    assert m.map(0, 0, 20, [(0, 0, 0)]) == 3.0
+
+def test_quantile_follows_module_seed(monkeypatch):
+    obj = make_sphere()
+    edges = []
+    for _ in range(2):
+        random.seed(3)
+        m = QuantileMapper3D(obj, skewed, output_range=(1, 8), samples=500)
+        edges.append(m.get_coefficients()[0])
+    assert edges[0] == edges[1]
+
+    # Bounds come from the same samples as the bins
+    calls = []
+    sample_surface = m.sample_surface
+    monkeypatch.setattr(m, 'sample_surface',
+            lambda: calls.append(1) or sample_surface())
+    m.values = None
+    low, high = m.get_bounds()
+    m.get_coefficients()
+    assert len(calls) == 1
+    assert low <= m.edges[0] and m.edges[-1] <= high
@@ -0,0 +1,62 @@
+# Sanity checks that the stand-in drives the pipeline end to end
+
+import bpy
+
+import main
+import worker
+from glyph import GLYPH_NAME, NAME_PREFIX
+from glyph_cube import HeightCubeGenerator
+from mesh_helpers import boolean_op, slice_obj
+
+def test_potato_is_closed(make_scene):
+    p, _ = make_scene(HeightCubeGenerator, 1)
+    mesh = p.blend_obj.data
+    faces_per_edge = {}
+    for poly in mesh.polygons:
+        vs = poly.vertices
+        for a, b in zip(vs, vs[1:] + vs[:1]):
+            key = (min(a, b), max(a, b))
+            faces_per_edge[key] = faces_per_edge.get(key, 0) + 1
+    assert set(faces_per_edge.values()) == {2}
+
+def test_glyphs_are_joined(make_scene):
+    _, g = make_scene(HeightCubeGenerator, 1)
+    points = g.distribute_poisson()
+    assert len(points) > 0
+    assert g.blend_obj.name == NAME_PREFIX + 'potato_000'
+    assert len(g.blend_obj.data.vertices) == 8 * len(points)
+    assert not any(ob.name.startswith(GLYPH_NAME)
+            for ob in bpy.context.scene.objects)
+
+def test_slice_halves(make_scene):
+    p, g = make_scene(HeightCubeGenerator, 1)
+    g.distribute_poisson()
+    boolean_op(g.blend_obj, p.blend_obj, 'DIFFERENCE')
+    bbox = tuple(p.bound_box[:])
+    bottom, top = slice_obj(p.blend_obj, op='INTERSECT', bound_box=bbox)
+    assert all(v.co.z <= 0.01 for v in bottom.data.vertices)
+    assert all(v.co.z >= -0.01 for v in top.data.vertices)
+
+def test_finalize_checks_whole_objects(make_scene):
+    p, g = make_scene(HeightCubeGenerator, 1)
+    g.distribute_poisson()
+    reports = main.finalize(p, g)
+    # The potato and glyphs, not the halves, which are open along the cut
+    assert [r.name for r in reports] == [p.blend_obj.name, g.blend_obj.name]
+    assert all(r.boundary_edges == 0 for r in reports)
+    assert all(r.passed for r in reports), '\n'.join(map(str, reports))
+
+def test_worker_exports_printable_models(tmp_path):
+    output = str(tmp_path / 'potato.stl')
+    result = worker.run_job({
+        'potato': {'resolution': 16, 'base_size': 15, 'max_peak_height': 3,
+                'margin': 1, 'smooth_steps': 2},
+        'mapper': {'field': 'x', 'output_range': [0.5, 3.0]},
+        'generator': 'HeightCubeGenerator',
+        'output': output,
+        'seed': 1,
+    })
+    assert result['printable']
+    assert result['output'] == output
+    with open(output) as f:
+        assert f.read().startswith('solid')
@@ -0,0 +1,48 @@
+# Noise-shaped potatoes
+
+import numpy
+
+from potato import NoisePotato, _fbm, _smoothstep
+
+BASE_SIZE = 15
+AMPLITUDE = 5
+MARGIN = 8
+
+def make_potato(seed):
+    p = NoisePotato(amplitude=AMPLITUDE, seed=seed, resolution=16,
+            base_size=BASE_SIZE, margin=MARGIN)
+    p.generate()
+    return p
+
+def coordinates(p):
+    return numpy.array([tuple(v.co) for v in p.blend_obj.data.vertices])
+
+def test_same_seed_same_shape():
+    first = coordinates(make_potato(3))
+    assert numpy.array_equal(first, coordinates(make_potato(3)))
+    assert not numpy.allclose(first, coordinates(make_potato(4)))
+
+def test_fbm_is_bounded():
+    points = numpy.random.RandomState(0).uniform(-10, 10, size=(5000, 3))
+    noise = _fbm(points, seed=1)
+    assert numpy.abs(noise).max() <= 1
+    assert noise.std() > 0.05
+
+def test_radius_and_pole_margin():
+    co = coordinates(make_potato(5))
+    r = numpy.linalg.norm(co, axis=1)
+    displacement = r - BASE_SIZE
+    assert numpy.abs(displacement).max() <= AMPLITUDE + 1e-4
+    assert numpy.abs(displacement).max() > 0.1
+
+    # Height each vertex had on the undisplaced sphere
+    z = BASE_SIZE * co[:, 2] / r
+    fade = _smoothstep((BASE_SIZE - z) / MARGIN) * \
+            _smoothstep((z + BASE_SIZE) / MARGIN)
+    assert (numpy.abs(displacement) <= AMPLITUDE * fade + 1e-4).all()
+    poles = numpy.abs(numpy.abs(z) - BASE_SIZE) < 1e-4
+    assert poles.sum() == 2
+    assert numpy.allclose(displacement[poles], 0, atol=1e-4)
+    # Some ring lies within the margin, and is only partly displaced
+    within = (BASE_SIZE - numpy.abs(z) < MARGIN) & ~poles
+    assert within.any()
@@ -0,0 +1,55 @@
+import random
+
+import bpy
+
+from glyph import NAME_PREFIX, PREVIEW_LAYERS
+from glyph_cube import HeightCubeGenerator, SharedCubeGenerator, \
+        SizeCubeGenerator
+
+def test_preview_is_a_single_point_cloud(make_potato):
+    p, m = make_potato(2)
+    g = HeightCubeGenerator(p.blend_obj, m.map, preview=True)
+    points = g.distribute_poisson()
+
+    cloud = g.preview_obj
+    assert g.blend_obj is None
+    assert cloud.dupli_type == 'VERTS'
+    assert len(cloud.data.vertices) == len(points)
+    assert len(cloud.data.polygons) == 0
+    assert set(l.name for l in cloud.data.vertex_layers_float) == \
+            set(PREVIEW_LAYERS)
+    instances = [ob for ob in bpy.context.scene.objects if ob.parent is cloud]
+    assert len(instances) == 1
+
+def test_finalize_matches_direct_build(make_potato):
+    p, m = make_potato(2)
+    random.seed(0)
+    direct = HeightCubeGenerator(p.blend_obj, m.map)
+    direct.distribute_poisson()
+    expected = sorted(tuple(round(c, 4) for c in v.co)
+            for v in direct.blend_obj.data.vertices)
+    direct.blend_obj.name = 'direct'
+
+    random.seed(0)
+    g = HeightCubeGenerator(p.blend_obj, m.map, preview=True)
+    g.distribute_poisson()
+    g.finalize()
+
+    assert g.preview_obj is None
+    assert g.blend_obj.name == NAME_PREFIX + p.name
+    assert sorted(tuple(round(c, 4) for c in v.co)
+            for v in g.blend_obj.data.vertices) == expected
+    assert not any(ob.dupli_type == 'VERTS' or ob.parent != None
+            for ob in bpy.context.scene.objects)
+
+def test_shared_finalize_builds_every_encoding(make_potato):
+    p, m = make_potato(2)
+    g = SharedCubeGenerator(p.blend_obj,
+            [(HeightCubeGenerator, m.map), (SizeCubeGenerator, m.map)],
+            preview=True)
+    g.distribute_poisson()
+    assert g.blend_objs == []
+    g.finalize()
+    assert [ob.name for ob in g.blend_objs] == [
+            NAME_PREFIX + p.name + '_HeightCubeGenerator',
+            NAME_PREFIX + p.name + '_SizeCubeGenerator']
@@ -0,0 +1,77 @@
+import bpy
+import numpy
+
+from glyph import GLYPH_NAME
+from mesh_helpers import delete_verts, select_all, select_fn
+from printability import _nearest, analyze, glyph_footprints, print_reports
+
+def add_cube(radius=1, location=(0, 0, 0), name=None):
+    bpy.ops.mesh.primitive_cube_add(radius=radius, location=location)
+    ob = bpy.context.active_object
+    if name != None:
+        ob.name = name
+    return ob
+
+def test_closed_cube_passes():
+    report = analyze(add_cube())
+    assert report.passed, str(report)
+    assert report.boundary_edges == 0
+    assert report.non_manifold_edges == 0
+    assert report.thickness_samples == 8
+    assert abs(report.min_thickness - 2 * 3**0.5) < 1e-3
+
+def test_open_mesh_fails():
+    bpy.ops.mesh.primitive_plane_add()
+    report = analyze(bpy.context.active_object)
+    assert not report.passed
+    assert report.boundary_edges == 4
+
+def test_non_manifold_edge():
+    mesh = bpy.data.meshes.new('fins')
+    # Three quads sharing the edge (0, 1)
+    mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (1, 0, 1),
+            (0, 0, 1), (1, -1, 0), (0, -1, 0)], [],
+            [(0, 1, 2, 3), (0, 1, 4, 5), (0, 1, 6, 7)])
+    ob = bpy.data.objects.new('fins', mesh)
+    bpy.context.scene.objects.link(ob)
+    report = analyze(ob)
+    assert report.non_manifold_edges == 1
+    assert not report.passed
+
+def test_thin_wall_fails():
+    ob = add_cube()
+    ob.scale[2] = 0.05
+    bpy.ops.object.transform_apply(scale=True)
+    report = analyze(ob, min_thickness=0.5)
+    assert report.thin_samples == report.thickness_samples
+    assert not report.passed
+
+def test_removed_glyph_is_flagged():
+    add_cube(location=(0, 0, 0), name=GLYPH_NAME)
+    add_cube(location=(5, 0, 0), name=GLYPH_NAME)
+    bpy.ops.object.select_pattern(pattern=GLYPH_NAME + '*')
+    bpy.ops.object.join()
+    bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+    glyphs = bpy.context.active_object
+    footprints = glyph_footprints(glyphs)
+    assert len(footprints[0]) == 2
+    assert all(abs(a - 24) < 1e-6 for a in footprints[1])
+
+    # Stand in for the boolean: remove all but the top of the second cube
+    select_all(glyphs, False)
+    select_fn(glyphs, lambda x, y, z: x > 2.5 and z < 0)
+    bpy.context.scene.objects.active = glyphs
+    delete_verts(glyphs)
+
+    report = analyze(glyphs, footprints=footprints)
+    assert report.glyphs == 2
+    assert report.removed_glyphs == 1
+    assert not report.passed
+    assert not print_reports([report])
+
+def test_nearest_matches_brute_force():
+    rng = numpy.random.RandomState(1)
+    points = rng.uniform(-10, 10, size=(300, 3))
+    targets = rng.uniform(-10, 10, size=(40, 3))
+    expected = numpy.linalg.norm(points[:, None] - targets[None], axis=2)
+    assert numpy.array_equal(_nearest(points, targets), expected.argmin(axis=1))
@@ -0,0 +1,82 @@
+# Sampling on a low-poly proxy and projecting onto the full potato
+
+import numpy
+import pytest
+
+import bpy
+from mathutils import Vector
+
+import collision
+from glyph import Glyph
+from glyph_cube import HeightCubeGenerator
+
+def make_proxy(p, scale=1.0):
+    '''Proxy of a potato, optionally grown so glyphs move when projected'''
+    proxy = p.make_proxy()
+    for i in range(3):
+        proxy.scale[i] = scale
+    bpy.ops.object.select_all(action='DESELECT')
+    proxy.select = True
+    bpy.ops.object.transform_apply(scale=True)
+    return proxy
+
+def assert_no_overlaps(g, points):
+    boxes = [g._glyph_box(point, points[point]) for point in points]
+    for i, (center, axes, extents) in enumerate(boxes):
+        others = boxes[:i] + boxes[i + 1:]
+        assert not collision.obb_overlaps(center, axes, extents,
+                numpy.array([b[0] for b in others]),
+                numpy.array([b[1] for b in others]),
+                numpy.array([b[2] for b in others])).any()
+
+def assert_on_target(g, points):
+    for point in points:
+        _, _, _, distance = g.target_bvh.find_nearest(Vector(point))
+        assert distance < 1e-6
+
+@pytest.mark.parametrize('scale', [1.0, 1.1])
+def test_projected_glyphs_do_not_overlap(make_potato, scale):
+    p, m = make_potato(2)
+    g = HeightCubeGenerator(make_proxy(p, scale), m.map, target=p.blend_obj)
+    g.cutoff = 5
+    points = g.distribute_poisson()
+    assert len(points) > 1
+    assert g.blend_obj.name.endswith(p.name)
+    assert len(g.blend_obj.data.vertices) == 8 * len(points)
+    assert_on_target(g, points)
+    assert_no_overlaps(g, points)
+
+def test_projected_chunks_do_not_overlap(make_potato):
+    p, m = make_potato(2)
+    g = HeightCubeGenerator(make_proxy(p, 1.1), m.map, target=p.blend_obj)
+    g.cutoff = 5
+    points = {}
+    for chunk in g.iter_poisson(chunk_size=8):
+        assert not set(chunk) & set(points)
+        points.update(chunk)
+    assert len(points) > 8
+    assert_on_target(g, points)
+    assert_no_overlaps(g, points)
+
+def test_project_keeps_sampled_frame_and_drops_collisions(make_potato):
+    p, m = make_potato(2)
+    g = HeightCubeGenerator(make_proxy(p), m.map, target=p.blend_obj)
+    co, normal, _, _ = g.target_bvh.find_nearest(Vector((0, 0, 20)))
+    # Two glyphs above the same spot, tilted away from the surface normal
+    sampled = Vector((1, 0, 0)) + normal
+    points = {tuple(co + 0.2 * normal): Glyph(1.0, sampled, Vector((0, 1, 0))),
+            tuple(co + 0.4 * normal): Glyph(1.0, sampled, Vector((0, 1, 0)))}
+    g._reset_collisions()
+    for point, glyph in points.items():
+        g._accept(point, glyph)
+
+    projected = g._project(points)
+    assert len(projected) == 1
+    (location, glyph), = projected.items()
+    assert_on_target(g, projected)
+    assert numpy.linalg.norm(numpy.subtract(location, tuple(co))) < 0.1
+    assert glyph.normal is sampled
+    assert tuple(glyph.gradient) == (0, 1, 0)
+    assert glyph.value == m.map(*location)
+    # Only the projected glyph is left in the collision index
+    assert list(g.box_ids) == [location]
@@ -0,0 +1,70 @@
+# Regional re-sampling of an existing glyph set
+
+import numpy
+import pytest
+
+import collision
+import mesh_helpers
+from glyph_cube import HeightCubeGenerator
+
+def island_centers(obj):
+    arrays = mesh_helpers.mesh_arrays(obj)
+    labels = mesh_helpers.vertex_islands(arrays)
+    _, index = numpy.unique(labels, return_inverse=True)
+    centers = numpy.zeros((index.max() + 1, 3))
+    numpy.add.at(centers, index, arrays['co'])
+    return centers / numpy.bincount(index)[:, None]
+
+def assert_matches_geometry(g, points):
+    built = island_centers(g.blend_obj)
+    expected = g._glyph_matrices(points)[:, :3, 3]
+    assert len(built) == len(expected)
+    for center in expected:
+        assert numpy.linalg.norm(built - center, axis=1).min() < 1e-4
+
+def assert_no_overlaps(g, points):
+    boxes = [g._glyph_box(point, points[point]) for point in points]
+    for i, (center, axes, extents) in enumerate(boxes):
+        others = boxes[:i] + boxes[i + 1:]
+        assert not collision.obb_overlaps(center, axes, extents,
+                numpy.array([b[0] for b in others]),
+                numpy.array([b[1] for b in others]),
+                numpy.array([b[2] for b in others])).any()
+
+def test_resample_region(make_scene):
+    _, g = make_scene(HeightCubeGenerator, 4, cutoff=5)
+    points = g.distribute_poisson()
+    region = ((0, 0, -20), (20, 20, 20))
+
+    def inside(co):
+        return all(l <= c <= h for l, c, h in zip(region[0], co, region[1]))
+
+    outside = {p for p in points if not inside(p)}
+    assert len(outside) < len(points)
+    result = g.resample(points, region=region)
+    # Glyphs outside the region are kept as they were
+    assert outside <= set(result)
+    assert any(inside(p) for p in result)
+    assert_no_overlaps(g, result)
+    assert_matches_geometry(g, result)
+
+def test_resample_polygons(make_scene):
+    _, g = make_scene(HeightCubeGenerator, 4, cutoff=5)
+    points = g.distribute_poisson()
+    polygons = [p.index for p in g.polygons[:20]]
+    result = g.resample(points, polygons=polygons)
+    assert len(result) > 0
+    assert_no_overlaps(g, result)
+    assert_matches_geometry(g, result)
+
+def test_delete_missing_glyph_raises(make_scene):
+    _, g = make_scene(HeightCubeGenerator, 4, cutoff=5)
+    points = g.distribute_poisson()
+    vertices = len(g.blend_obj.data.vertices)
+    (x, y, z), glyph = next(iter(points.items()))
+    with pytest.raises(ValueError):
+        g._delete_glyphs({(x, y, z): glyph, (x + 0.5, y, z): glyph})
+    # Nothing is deleted unless every glyph is found
+    assert len(g.blend_obj.data.vertices) == vertices
+    g._delete_glyphs({(x, y, z): glyph})
+    assert len(g.blend_obj.data.vertices) == vertices - 8
@@ -0,0 +1,157 @@
+# Checks that the pipeline's hot paths scale sub-quadratically with mesh
+# resolution. Each test measures a stage at several potato resolutions and
+# fails if the growth exponent k of runtime ~ vertices^k between the two
+# largest resolutions exceeds the configured limit. Small sizes are
+# dominated by fixed costs, so a fit over all of them hides regressions.
+#
+# The timing tests are slow and only run with --runslow. Limits can be
+# tightened or relaxed per run, e.g.
+#   SCALING_MAX_TIME_EXPONENT=1.2 python -m pytest --runslow tests
+
+import os
+import math
+import time
+import random
+
+import pytest
+
+import blender_utils
+import collision
+from glyph_cube import HeightCubeGenerator
+from mesh_helpers import slice_obj
+
+RESOLUTIONS = (16, 32, 64)
+MAX_TIME_EXPONENT = float(os.environ.get('SCALING_MAX_TIME_EXPONENT', 1.5))
+# Glyph spacing is set by the glyph size, not the mesh, so the number of
+# glyphs should barely change with resolution
+MAX_GLYPH_EXPONENT = float(os.environ.get('SCALING_MAX_GLYPH_EXPONENT', 0.5))
+# Work counted in units, e.g. boxes tested per candidate, is deterministic
+# and should grow no faster than the mesh
+MAX_WORK_EXPONENT = float(os.environ.get('SCALING_MAX_WORK_EXPONENT', 1.15))
+REPEATS = 3
+
+def growth_exponent(sizes, measurements):
+    '''Least-squares slope of log(measurement) against log(size)'''
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(m, 1e-9)) for m in measurements]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    num = sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+    den = sum((x - x_mean) ** 2 for x in xs)
+    return num / den
+
+def best_time(setup, run):
+    '''Fastest of REPEATS runs of run(*setup()), not timing setup'''
+    times = []
+    for _ in range(REPEATS):
+        args = setup()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+@pytest.fixture
+def potatoes(make_potato):
+    '''Seeded potato and mapper at every resolution'''
+    return [make_potato(r, resolution=r) for r in RESOLUTIONS]
+
+def make_generator(p, m):
+    # Compute the mapping up front so it isn't timed
+    m.map(0, 0, 0)
+    return HeightCubeGenerator(p.blend_obj, m.map)
+
+def vertex_counts():
+    # A UV sphere with r segments and r / 2 rings
+    return [r * (r // 2 - 1) + 2 for r in RESOLUTIONS]
+
+def assert_exponent(name, sizes, measurements, limit):
+    k = growth_exponent(sizes[-2:], measurements[-2:])
+    print('{}: exponent {:.2f} (limit {:.2f}) over {}'.format(
+            name, k, limit, list(zip(sizes, measurements))))
+    assert k <= limit, '{} grows as vertices^{:.2f}, limit is {:.2f}'.format(
+            name, k, limit)
+
+def test_growth_exponent():
+    sizes = [10, 100, 1000]
+    assert abs(growth_exponent(sizes, [s ** 2 for s in sizes]) - 2) < 1e-9
+    assert abs(growth_exponent(sizes, [3.0] * 3)) < 1e-9
+
+def test_vertex_counts(potatoes):
+    assert vertex_counts() == [len(p.blend_obj.data.vertices)
+            for p, _ in potatoes]
+
+def test_collision_work_scaling(potatoes, monkeypatch):
+    # Boxes reaching the separating axis test, per resolution
+    tested = []
+    obb_overlaps = collision.obb_overlaps
+
+    def count(center, axes, extents, centers, axes_b, extents_b):
+        tested[-1] += len(centers)
+        return obb_overlaps(center, axes, extents, centers, axes_b, extents_b)
+
+    monkeypatch.setattr(collision, 'obb_overlaps', count)
+    glyphs = []
+    for p, m in potatoes:
+        tested.append(0)
+        random.seed(0)
+        glyphs.append(len(make_generator(p, m).distribute_poisson()))
+    sizes = vertex_counts()
+    assert min(glyphs) > 0
+    assert_exponent('boxes tested', sizes, tested, MAX_WORK_EXPONENT)
+    assert_exponent('glyph count', sizes, glyphs, MAX_GLYPH_EXPONENT)
+
+@pytest.mark.slow
+def test_potato_generate_scaling(make_potato):
+    times = [best_time(lambda: (), lambda r=r: make_potato(r, resolution=r))
+            for r in RESOLUTIONS]
+    assert_exponent('Potato.generate', vertex_counts(), times,
+            MAX_TIME_EXPONENT)
+
+@pytest.mark.slow
+def test_gradient_scaling(potatoes):
+    def setup(mesh):
+        # The same number of vertices, spread over the mesh, at every size
+        step = len(mesh.vertices) // 10
+        return mesh, range(1, 10 * step, step)
+
+    def run(mesh, indices):
+        for i in indices:
+            blender_utils.gradient_at_vertex_2(mesh.edges, mesh.vertices, i)
+
+    meshes = [p.blend_obj.data for p, _ in potatoes]
+    times = [best_time(lambda m=m: setup(m), run) for m in meshes]
+    assert_exponent('gradient_at_vertex_2', vertex_counts(), times,
+            MAX_TIME_EXPONENT)
+
+@pytest.mark.slow
+def test_vertex_gradients_scaling(potatoes):
+    meshes = [p.blend_obj.data for p, _ in potatoes]
+    times = [best_time(lambda m=m: (m.vertices, m.edges),
+            blender_utils.vertex_gradients) for m in meshes]
+    assert_exponent('vertex_gradients', vertex_counts(), times,
+            MAX_TIME_EXPONENT)
+
+@pytest.mark.slow
+def test_distribute_poisson_scaling(potatoes):
+    # The potato isn't changed by sampling, so reuse one per resolution
+    def setup(p, m):
+        random.seed(0)
+        return (make_generator(p, m),)
+
+    def run(g):
+        g.distribute_poisson()
+
+    times = [best_time(lambda p=p, m=m: setup(p, m), run)
+            for p, m in potatoes]
+    assert_exponent('distribute_poisson', vertex_counts(), times,
+            MAX_TIME_EXPONENT)
+
+@pytest.mark.slow
+def test_slice_obj_scaling(potatoes):
+    def run(obj, bbox):
+        # Not destructive, so the potato can be sliced again
+        slice_obj(obj, True, op='INTERSECT', bound_box=bbox)
+
+    times = [best_time(lambda p=p: (p.blend_obj, tuple(p.bound_box[:])), run)
+            for p, _ in potatoes]
+    assert_exponent('slice_obj', vertex_counts(), times, MAX_TIME_EXPONENT)
@@ -0,0 +1,120 @@
+# Chunked sampling and the streaming pipeline
+
+import random
+
+import numpy
+import pytest
+
+import bpy
+
+import pipeline
+from glyph import GLYPH_NAME, NAME_PREFIX
+from glyph_cube import HeightCubeGenerator, SharedCubeGenerator, \
+        SizeCubeGenerator
+
+def read_ply(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    header, body = data.split(b'end_header\n', 1)
+    count = int([line for line in header.decode('ascii').split('\n')
+            if line.startswith('element vertex')][0].split()[-1])
+    return count, numpy.frombuffer(body, dtype='<f4').reshape(count, -1)
+
+def test_chunks_match_distribute_poisson(make_scene):
+    _, g = make_scene(SizeCubeGenerator, 5, output_range=(0.314, 2.5),
+            cutoff=5)
+    random.seed(0)
+    chunks = list(g.iter_poisson(chunk_size=8))
+    _, g = make_scene(SizeCubeGenerator, 5, output_range=(0.314, 2.5),
+            cutoff=5)
+    random.seed(0)
+    points = g.distribute_poisson()
+    assert len(chunks) > 1
+    streamed = {}
+    for chunk in chunks:
+        streamed.update(chunk)
+    assert set(streamed) == set(points)
+
+def test_run_pipeline(make_scene, tmp_path):
+    _, g = make_scene(SizeCubeGenerator, 5, output_range=(0.314, 2.5),
+            cutoff=5)
+    ply = str(tmp_path / 'glyphs.ply')
+    checkpoint = str(tmp_path / 'glyphs.jsonl')
+    total = pipeline.run_pipeline(g, [pipeline.PlyWriter(ply),
+            pipeline.CheckpointWriter(checkpoint)], chunk_size=8, queue_size=2)
+    assert total > 8
+    assert len(g.blend_obj.data.vertices) == 8 * total
+
+    count, vertices = read_ply(ply)
+    assert count == total
+    saved = pipeline.read_checkpoint(checkpoint)
+    assert saved.shape == (total, len(pipeline.FIELDS))
+    assert numpy.allclose(vertices, saved, atol=1e-4)
+
+    glyphs = pipeline.array_glyphs(saved)
+    assert len(glyphs) == total
+    assert sorted(g.value for g in glyphs.values()) == sorted(saved[:, 9])
+
+def test_chunks_are_joined_once(make_scene, monkeypatch):
+    p, g = make_scene(SizeCubeGenerator, 5, output_range=(0.314, 2.5),
+            cutoff=5)
+    # Vertices of every object going through a join
+    joined = []
+    join = bpy.ops.object.join
+
+    def count():
+        joined.append(sum(len(ob.data.vertices)
+                for ob in bpy.context.selected_objects))
+        return join()
+
+    monkeypatch.setattr(bpy.ops.object, 'join', count)
+    total = pipeline.run_pipeline(g, chunk_size=4)
+    assert total > 16
+    vertices = len(g.blend_obj.data.vertices)
+    assert vertices == 8 * total
+    # Each glyph is joined into its chunk, then the chunks once at the end,
+    # rather than every chunk into the growing glyph object
+    assert sum(joined) == 2 * vertices
+    assert g.chunk_objs == []
+    assert [ob.name for ob in bpy.context.scene.objects
+            if ob.name.startswith(NAME_PREFIX)] == [NAME_PREFIX + p.name]
+
+def test_shared_pipeline_builds_every_encoding(make_potato):
+    p, m = make_potato(5)
+    g = SharedCubeGenerator(p.blend_obj,
+            [(HeightCubeGenerator, m.map), (SizeCubeGenerator, m.map)])
+    g.cutoff = 5
+    total = pipeline.run_pipeline(g, chunk_size=8)
+    assert [ob.name for ob in g.blend_objs] == [
+            NAME_PREFIX + p.name + '_HeightCubeGenerator',
+            NAME_PREFIX + p.name + '_SizeCubeGenerator']
+    assert all(len(ob.data.vertices) == 8 * total for ob in g.blend_objs)
+    assert not any(ob.name.startswith(GLYPH_NAME)
+            for ob in bpy.context.scene.objects)
+
+def test_partial_checkpoint(tmp_path):
+    path = str(tmp_path / 'partial.jsonl')
+    writer = pipeline.CheckpointWriter(path)
+    writer.write(numpy.ones((3, len(pipeline.FIELDS))))
+    writer.close()
+    with open(path, 'a') as f:
+        f.write('[[1.0, 2.0')
+    assert len(pipeline.read_checkpoint(path)) == 3
+
+class FailingWriter:
+    def __init__(self):
+        self.closed = False
+
+    def write(self, block):
+        raise IOError('disk full')
+
+    def close(self):
+        self.closed = True
+
+def test_writer_errors_are_raised(make_scene):
+    _, g = make_scene(SizeCubeGenerator, 5, output_range=(0.314, 2.5),
+            cutoff=5)
+    writer = FailingWriter()
+    with pytest.raises(IOError):
+        pipeline.run_pipeline(g, [writer], chunk_size=4, build=False)
+    assert writer.closed
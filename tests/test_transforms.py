@@ -0,0 +1,73 @@
+# Batched glyph frames and transforms
+
+import numpy
+
+import bpy
+from mathutils import Vector
+
+import blender_utils
+from glyph_cube import HeightCubeGenerator
+
+def assert_right_handed(frames):
+    for frame in frames:
+        assert numpy.allclose(frame.T.dot(frame), numpy.eye(3), atol=1e-9)
+        assert abs(numpy.linalg.det(frame) - 1) < 1e-9
+
+def test_frames_are_orthonormal_and_right_handed():
+    rng = numpy.random.RandomState(7)
+    normals = rng.normal(size=(50, 3))
+    gradients = rng.normal(size=(50, 3))
+    frames = blender_utils.gradient_frames(normals, gradients)
+    assert frames.shape == (50, 3, 3)
+    assert_right_handed(frames)
+    # z follows the normal; x lies in the plane of the normal and gradient
+    z = normals / numpy.linalg.norm(normals, axis=1)[:, None]
+    assert numpy.allclose(frames[:, :, 2], z)
+    planes = numpy.cross(normals, gradients)
+    assert numpy.allclose((frames[:, :, 0] * planes).sum(axis=1), 0,
+            atol=1e-9)
+
+def test_parallel_and_zero_gradients():
+    normals = [(0, 0, 1), (0, 0, 2), (1, 0, 0), (0, 1, 0)]
+    gradients = [(0, 0, 3), (0, 0, 0), (-2, 0, 0), (0, 0, 0)]
+    frames = blender_utils.gradient_frames(normals, gradients)
+    assert numpy.isfinite(frames).all()
+    assert_right_handed(frames)
+    unit = numpy.array(normals, dtype=float)
+    unit /= numpy.linalg.norm(unit, axis=1)[:, None]
+    assert numpy.allclose(frames[:, :, 2], unit)
+
+def test_empty_input():
+    matrices = blender_utils.glyph_transforms([], [], [], numpy.zeros((0, 3)),
+            numpy.zeros(0))
+    assert matrices.shape == (0, 4, 4)
+
+def test_height_transforms_match_per_object_path():
+    rng = numpy.random.RandomState(3)
+    locations = rng.uniform(-10, 10, size=(10, 3))
+    normals = rng.normal(size=(10, 3))
+    normals /= numpy.linalg.norm(normals, axis=1)[:, None]
+    gradients = rng.normal(size=(10, 3))
+    values = rng.uniform(0.5, 3, size=10)
+
+    # Scales and offsets from HeightCubeGenerator, without needing a mesh
+    scales = HeightCubeGenerator._glyph_scales(None, values)
+    offsets = HeightCubeGenerator._glyph_offsets(None, values)
+    assert numpy.allclose(scales[:, :2], 0.75)
+    assert numpy.allclose(scales[:, 2], 1.15 * values)
+    assert numpy.allclose(offsets, 0.85 * values)
+    matrices = blender_utils.glyph_transforms(locations, normals, gradients,
+            scales, offsets)
+
+    for i in range(10):
+        # The per-object path HeightCubeGenerator used before batching
+        bpy.ops.mesh.primitive_cube_add(radius=1, location=tuple(locations[i]))
+        ob = bpy.context.active_object
+        blender_utils.rotate_obj_gradient(ob, Vector(normals[i]),
+                Vector(gradients[i]))
+        ob.scale[0] = 0.75
+        ob.scale[1] = 0.75
+        ob.scale[2] = values[i] * 1.15
+        ob.location += 0.85 * values[i] * Vector(normals[i])
+        expected = numpy.array([list(row) for row in ob.matrix_world])
+        assert numpy.allclose(matrices[i], expected, atol=1e-6)
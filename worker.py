@@ -0,0 +1,222 @@
+#  Copyright 2018 Bridger Herman
+
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Long-lived Blender worker. Run one per core with
+#
+#   blender --background --python worker.py -- /path/to/queue
+#
+# and submit jobs with job_queue.JobClient. A job is a dict like
+#
+#   {
+#       "potato": {"resolution": 64, "base_size": 40, "shape": "noise"},
+#       "mapper": {"field": "x", "output_range": [0.314, 2.5], "num_bins": 8},
+#       "generator": "SizeCubeGenerator",
+#       "output": "/tmp/potato.stl",
+#       "seed": 1
+#   }
+#
+# "field" is an arithmetic expression in x, y, z, numbers and math
+# functions/constants (e.g. "math.sin(x) * y"); the mapper "type"
+# is "linear" (default) or "quantile". "shape": "noise"
+# selects NoisePotato; any other potato keys are constructor arguments.
+# Models failing the printability checks are not written unless the job
+# sets "force": true. A "points" path streams the glyphs to a binary PLY
+# point cloud while they are built.
+#
+# Jobs are trusted input: they name files the worker writes, so only let
+# trusted users write to the queue directory. Field expressions are parsed
+# and checked before they are compiled, but that is a guard against
+# mistakes rather than a sandbox.
+
+import bpy
+import sys
+import ast
+import math
+import time
+import random
+import traceback
+import importlib
+
+sys.path.append(".")
+
+# Imported once per worker, instead of once per run
+import glyph_cube
+importlib.reload(glyph_cube)
+from glyph_cube import *
+
+import mapper
+importlib.reload(mapper)
+from mapper import *
+
+import potato
+importlib.reload(potato)
+from potato import *
+
+import mesh_helpers
+importlib.reload(mesh_helpers)
+from mesh_helpers import *
+
+import job_queue
+importlib.reload(job_queue)
+
+import main
+importlib.reload(main)
+
+import pipeline
+importlib.reload(pipeline)
+
+GENERATORS = {cls.__name__: cls for cls in (
+    SizeCubeGenerator,
+    HeightCubeGenerator,
+    LengthCubeGenerator,
+    LengthCubeGenerator2,
+)}
+
+def reset_scene():
+    '''Delete every object and orphaned mesh left over from the last job'''
+    if bpy.context.object != None and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.select_all(action='SELECT')
+    bpy.ops.object.delete(use_global=False)
+    for mesh in list(bpy.data.meshes):
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+# Syntax allowed in field expressions
+FIELD_NODES = (ast.Load, ast.BinOp, ast.UnaryOp, ast.Call, ast.Attribute,
+        ast.Name, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+        ast.UAdd, ast.USub) + tuple(getattr(ast, name)
+        for name in ('Num', 'Constant') if hasattr(ast, name))
+
+def _check_field(node):
+    if not isinstance(node, FIELD_NODES):
+        raise ValueError('{} is not allowed in a field expression'.format(
+                type(node).__name__))
+    if isinstance(node, ast.Name) and node.id not in ('x', 'y', 'z', 'math'):
+        raise ValueError('Unknown name {!r} in field expression'.format(node.id))
+    if isinstance(node, ast.Attribute) and (node.attr.startswith('_') or
+            not isinstance(node.value, ast.Name) or node.value.id != 'math' or
+            not hasattr(math, node.attr)):
+        raise ValueError('Only math functions and constants are allowed')
+    if isinstance(node, ast.Call) and (node.keywords or
+            not isinstance(node.func, ast.Attribute)):
+        raise ValueError('Only math functions can be called')
+    value = getattr(node, 'value', getattr(node, 'n', 0))
+    if type(node).__name__ in ('Num', 'Constant') and \
+            not isinstance(value, (int, float)):
+        raise ValueError('Only numeric constants are allowed')
+
+def field_fn(expression):
+    '''Compile a scalar field expression in x, y, z'''
+    source = 'lambda x, y, z: ' + expression
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as e:
+        raise ValueError('Bad field expression {!r}: {}'.format(expression, e))
+    if not isinstance(tree.body, ast.Lambda) or tree.body.args.defaults:
+        raise ValueError('Bad field expression {!r}'.format(expression))
+    for node in ast.walk(tree.body.body):
+        _check_field(node)
+    return eval(compile(tree, '<field>', 'eval'),
+            {'__builtins__': {}, 'math': math})
+
+def run_job(job):
+    '''Build and export one potato, returning a summary dict'''
+    start_time = time.time()
+    if 'seed' in job:
+        random.seed(job['seed'])
+
+    potato_config = dict(job.get('potato', {}))
+    potato_cls = NoisePotato if potato_config.pop('shape', None) == 'noise' \
+            else Potato
+    p = potato_cls(**potato_config)
+    p.generate()
+    minm, maxm = p.bound_box
+
+    config = job.get('mapper', {})
+    f = field_fn(config.get('field', 'x'))
+    bundle = [(minm.x, maxm.x), (minm.y, maxm.y), (minm.z, maxm.z), f]
+    if config.get('type', 'linear') == 'quantile':
+        m = QuantileMapper3D(p.blend_obj, f,
+                output_range=tuple(config['output_range']),
+                num_bins=config.get('num_bins', 8))
+    else:
+        m = LinearMapper3D(*bundle, output_range=tuple(config['output_range']),
+                num_bins=config.get('num_bins', 8))
+
+    try:
+        generator_cls = GENERATORS[job['generator']]
+    except KeyError:
+        raise ValueError('Unknown generator {!r}'.format(job.get('generator')))
+    g = generator_cls(p.blend_obj, m.map)
+    if job.get('points') != None:
+        glyphs = pipeline.run_pipeline(g,
+                [pipeline.PlyWriter(job['points'])])
+    else:
+        glyphs = len(g.distribute_poisson())
+
+    reports = main.finalize(p, g)
+    printable = all(r.passed for r in reports)
+
+    # Don't write models that would fail to print, unless asked to
+    output = job.get('output')
+    if output != None and (printable or job.get('force', False)):
+        bpy.ops.object.select_all(action='SELECT')
+        bpy.ops.export_mesh.stl(filepath=output, use_selection=True)
+    else:
+        output = None
+
+    return {
+        'glyphs': glyphs,
+        'output': output,
+        'printable': printable,
+        'analysis': [r.as_dict() for r in reports],
+        'time': time.time() - start_time,
+    }
+
+def serve(queue_path, poll_interval=0.5, max_jobs=None):
+    '''Pull jobs from the queue until max_jobs have run (forever if None)'''
+    queue = job_queue.JobQueue(queue_path)
+    print('Worker waiting for jobs in {}'.format(queue_path))
+    completed = 0
+    while max_jobs == None or completed < max_jobs:
+        job = queue.claim()
+        if job == None:
+            time.sleep(poll_interval)
+            continue
+        print('Starting job {}'.format(job['id']))
+        try:
+            reset_scene()
+            # Let other workers know this one is still alive
+            with queue.keep_alive(job['id']):
+                result = dict(run_job(job), status='ok')
+        except Exception:
+            result = {'status': 'error', 'error': traceback.format_exc()}
+            print(result['error'])
+        queue.finish(job['id'], result)
+        completed += 1
+
+if __name__ == '__main__':
+    # Blender passes script arguments after '--'
+    args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    if len(args) < 1:
+        print('Usage: blender --background --python worker.py -- QUEUE_DIR')
+        sys.exit(1)
+    serve(args[0])